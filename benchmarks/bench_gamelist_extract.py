@@ -0,0 +1,92 @@
+"""Benchmark globalUserInfos extraction: streaming extractor vs the old greedy regex.
+
+Usage:
+    python benchmarks/bench_gamelist_extract.py [saved_gamelist.html] [--repeat N]
+
+Without a saved page, one is synthesised from bga_games.json with the
+catalogue surrounded by unrelated globalUserInfos keys, as on the live page.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from bga_functions import GAMES_FILE, _extract_user_infos  # noqa: E402
+
+
+def regex_extract(text):
+    """The original pull_game_list path."""
+    match = re.search(r'globalUserInfos\s*=\s*(\{.*\})', text)
+    raw_json = match.group(1)
+    user_infos, _ = json.JSONDecoder().raw_decode(raw_json)
+    return {"game_list": user_infos["game_list"], "game_tags": user_infos.get("game_tags", [])}
+
+
+def synthesise_page():
+    with open(GAMES_FILE, "r") as f:
+        games = json.load(f)
+    tag_ids = {}
+    for g in games:
+        raw_tags = []
+        for t in g.get("tags", []):
+            if "id" in t:
+                raw_tags.append([t["id"], t["value"]])
+                continue
+            key = (t["name"], t["category"])
+            tag_ids.setdefault(key, len(tag_ids) + 1)
+            raw_tags.append([tag_ids[key], t["value"]])
+        g["tags"] = raw_tags
+    game_tags = [{"id": i, "name": name, "cat": cat} for (name, cat), i in tag_ids.items()]
+    filler = {f"key_{i}": {"text": "x \\\" } { ] [" * 20, "values": list(range(50))} for i in range(2000)}
+    user_infos = dict(filler, game_list=games, game_tags=game_tags, trailing=filler)
+    return (
+        "<html><head><script>\nvar globalUserInfos = " + json.dumps(user_infos) + ";\n"
+        "var other = {\"a\": 1};\n</script></head><body>" + "<div>padding</div>" * 50000 + "</body></html>"
+    )
+
+
+def measure(fn, text, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("page", nargs="?", help="Saved gamelist?section=all HTML page")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = synthesise_page()
+    print(f"Page size: {len(text) / 1e6:.1f} MB")
+
+    regex_result, regex_time, regex_peak = measure(regex_extract, text, args.repeat)
+    stream_result, stream_time, stream_peak = measure(_extract_user_infos, text, args.repeat)
+    if stream_result != regex_result:
+        raise SystemExit("ERROR: extractors disagree")
+
+    print(f"{'path':<10} {'best time':>12} {'peak alloc':>12}")
+    print(f"{'regex':<10} {regex_time * 1000:>10.1f}ms {regex_peak / 1e6:>10.1f}MB")
+    print(f"{'stream':<10} {stream_time * 1000:>10.1f}ms {stream_peak / 1e6:>10.1f}MB")
+    print(f"Speedup: {regex_time / stream_time:.1f}x, peak memory: {regex_peak / stream_peak:.1f}x lower")
+
+
+if __name__ == "__main__":
+    main()
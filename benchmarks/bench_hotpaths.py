@@ -0,0 +1,253 @@
+"""Benchmark the stats and suggestion hot paths on synthetic data.
+
+Usage:
+    python benchmarks/bench_hotpaths.py [--tables 10000 100000] [--games 1200]
+                                        [--repeat 3] [--compare results/old.json]
+
+For each history size a synthetic history (varied player groups, rank and
+score strings in BGA's comma-joined format) and catalogue are written to a
+scratch data directory. Each entry point then runs in its own subprocess
+with BGA_DATA_DIR pointing there, so peak RSS is per entry point. Wall time
+is the best of ``--repeat`` runs; allocations are the tracemalloc peak of
+one extra traced run. Results are saved under benchmarks/results/ so runs
+from different commits can be compared with ``--compare``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+CORE_PLAYERS = ["thomaspr", "alice2", "kristiah", "thepengineer"]
+TAG_POOL = [
+    ("For core gamers", "Category"), ("Family games", "Category"), ("Award-winning games", ""),
+    ("BGA Awards '25 Nominee", ""), ("Animals", "Theme"), ("Fantasy", "Theme"), ("Trains", "Theme"),
+    ("Science fiction", "Theme"), ("Hand management", "Mechanism"), ("Tile placement", "Mechanism"),
+    ("Drafting", "Mechanism"), ("Worker placement", "Mechanism"), ("Dice", "Mechanism"),
+]
+
+ENTRY_POINTS = {
+    "generate_stats": "generate_stats()",
+    "generate_stats_incremental": "generate_stats([], history_size=len(get_history_store()))",
+    "stats_rebuild": "_rebuild_stats_state()",
+    "stats_rebuild_fold": "_rebuild_stats_state(vectorized=False)",
+    "suggest_forgotten_games": "suggest_forgotten_games()",
+    "suggest_new_games": "suggest_new_games()",
+}
+
+
+def synth_catalogue(n_games, rng):
+    games = []
+    for i in range(n_games):
+        lo = rng.choice([1, 1, 2, 2, 2, 3])
+        hi = max(lo, rng.choice([2, 4, 4, 5, 6, 8]))
+        tags = [{"name": name, "category": cat, "value": rng.randint(0, 5)}
+                for name, cat in rng.sample(TAG_POOL, rng.randint(2, 6))]
+        games.append({
+            "id": 1000 + i,
+            "name": f"game{i}",
+            "display_name_en": f"Game {i}",
+            "weight": rng.randint(0, 100000),
+            "aliases": [],
+            "tags": tags,
+            "player_numbers": list(range(lo, hi + 1)),
+            "average_duration": rng.randint(5, 120),
+            "realtime": "yes",
+            "turnbased": rng.choice(["yes", "yes", "no"]),
+            "min_player_number": lo,
+            "max_player_number": hi,
+        })
+    return games
+
+
+def synth_history(n_tables, catalogue, rng):
+    extra_players = [f"player{i}" for i in range(40)]
+    player_ids = {p: str(85000000 + i) for i, p in enumerate(CORE_PLAYERS + extra_players)}
+    groups = [CORE_PLAYERS[:3], CORE_PLAYERS, CORE_PLAYERS[:2]]
+    groups += [rng.sample(CORE_PLAYERS, 2) + rng.sample(extra_players, rng.randint(0, 3)) for _ in range(30)]
+    # Players have favourites, so weight the catalogue towards a subset
+    favourites = rng.sample(catalogue, min(len(catalogue), 150))
+    end = int(datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp())
+    # Spread the tables over roughly six years, newest first
+    mean_gap = max(1, 6 * 365 * 86400 // n_tables)
+    tables = []
+    for i in range(n_tables):
+        game = rng.choice(favourites) if rng.random() < 0.8 else rng.choice(catalogue)
+        players = rng.choice(groups)[:]
+        rng.shuffle(players)
+        scores = sorted((rng.randint(20, 250) for _ in players), reverse=True)
+        ranks = [1 + sum(1 for other in scores if other > s) for s in scores]
+        duration = rng.randint(600, 7200)
+        end -= rng.randint(1, 2 * mean_gap)
+        tables.append({
+            "table_id": str(900000000 - i),
+            "game_name": game["name"],
+            "game_id": str(game["id"]),
+            "ranking_disabled": "0",
+            "start": str(end - duration),
+            "end": str(end),
+            "concede": "0",
+            "unranked": "0",
+            "normalend": "1",
+            "players": ",".join(player_ids[p] for p in players),
+            "player_names": ",".join(players),
+            "scores": ",".join(map(str, scores)),
+            "ranks": ",".join(map(str, ranks)),
+            "elo_win": None,
+            "elo_penalty": "",
+            "elo_after": None,
+            "arena_win": None,
+            "arena_after": None,
+        })
+    return tables
+
+
+def prepare_data_dir(n_tables, n_games, seed):
+    rng = random.Random(seed)
+    data_dir = tempfile.mkdtemp(prefix=f"bga-bench-{n_tables}-")
+    catalogue = synth_catalogue(n_games, rng)
+    with open(os.path.join(data_dir, "bga_games.json"), "w") as f:
+        json.dump(catalogue, f)
+    with open(os.path.join(data_dir, "bga_history.json"), "w") as f:
+        json.dump(synth_history(n_tables, catalogue, rng), f)
+    # Seed the history store and catalogue index outside the timed runs
+    run_child(data_dir, "get_history_store(); get_catalogue_index()", repeat=1, trace=False)
+    return data_dir
+
+
+def run_child(data_dir, statement, repeat, trace):
+    env = dict(os.environ, BGA_DATA_DIR=data_dir)
+    cmd = [sys.executable, __file__, "--child", statement, "--repeat", str(repeat)]
+    if trace:
+        cmd.append("--trace")
+    out = subprocess.run(cmd, env=env, cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def child(statement, repeat, trace):
+    sys.path.insert(0, BASE_DIR)
+    import bga_data
+    import bga_functions
+    namespace = dict(vars(bga_functions))
+
+    # Every run starts cold: drop whatever the data layer memoized
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            bga_data.invalidate()
+            start = time.perf_counter()
+            exec(statement, namespace)
+            times.append(time.perf_counter() - start)
+        peak_alloc = None
+        if trace:
+            bga_data.invalidate()
+            tracemalloc.start()
+            exec(statement, namespace)
+            peak_alloc = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    print(json.dumps({"wall_s": min(times), "peak_rss_bytes": peak_rss(), "peak_alloc_bytes": peak_alloc}))
+
+
+def peak_rss():
+    """This process's peak RSS in bytes.
+
+    ru_maxrss survives fork+exec, so a child would report the parent's peak
+    (the generated history) instead of its own; VmHWM is reset by exec.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_table(results, baseline=None):
+    print(f"{'tables':>9} {'entry point':<28} {'wall':>10} {'peak RSS':>10} {'peak alloc':>11} {'vs base':>8}")
+    for run in results["runs"]:
+        for name, m in run["entry_points"].items():
+            delta = ""
+            if baseline:
+                base = baseline.get((run["tables"], name))
+                if base:
+                    delta = f"{m['wall_s'] / base['wall_s']:.2f}x"
+            alloc = f"{m['peak_alloc_bytes'] / 1e6:.1f}MB" if m["peak_alloc_bytes"] is not None else "-"
+            print(f"{run['tables']:>9} {name:<28} {m['wall_s'] * 1000:>8.1f}ms "
+                  f"{m['peak_rss_bytes'] / 1e6:>8.1f}MB {alloc:>11} {delta:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, nargs="+", default=[10000])
+    parser.add_argument("--games", type=int, default=1200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--entry", choices=ENTRY_POINTS, nargs="+", default=list(ENTRY_POINTS))
+    parser.add_argument("--no-trace", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--compare", help="Earlier results JSON to compare wall times against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--trace", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.repeat, args.trace)
+        return
+
+    results = {
+        "revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "games": args.games,
+        "runs": [],
+    }
+    for n_tables in args.tables:
+        print(f"Generating {n_tables} tables and {args.games} games...")
+        data_dir = prepare_data_dir(n_tables, args.games, args.seed)
+        run = {"tables": n_tables, "entry_points": {}}
+        for name in args.entry:
+            print(f"  {name}...")
+            run["entry_points"][name] = run_child(data_dir, ENTRY_POINTS[name], args.repeat, not args.no_trace)
+        results["runs"].append(run)
+        shutil.rmtree(data_dir)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_file = os.path.join(RESULTS_DIR, f"{results['revision']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out_file, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            old = json.load(f)
+        baseline = {(r["tables"], name): m for r in old["runs"] for name, m in r["entry_points"].items()}
+    print()
+    print_table(results, baseline)
+    print(f"\nResults saved to {out_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import bisect
+
+from bga_storage import load_binary, save_binary
+
+CATALOGUE_INDEX_VERSION = 2
+
+DURATION_BUCKETS = (("Short", 20), ("Medium", 45), ("Long", 75))
+
+
+def duration_bucket(average_duration):
+    dur = average_duration or 0
+    for label, limit in DURATION_BUCKETS:
+        if dur <= limit:
+            return label
+    return None
+
+
+class CatalogueIndex:
+    """Precomputed filters over the BGA game catalogue.
+
+    Every game gets a position in catalogue order, and each filterable
+    property maps to an int bitset over those positions: supported player
+    counts, duration bucket, realtime/turn-based availability and each tag
+    (interned as ``(name, category)`` -> tag id). Filters are then bitset
+    intersections, e.g.::
+
+        mask = index.query(players=3, min_weight=50, duration="Short")
+        ids = index.ids(mask & ~index.mask_of(played_ids))
+
+    The index also keeps the handful of fields suggestions print, so they
+    do not need to load the full catalogue.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.game_ids = data["ids"]
+        self.positions = {gid: pos for pos, gid in enumerate(self.game_ids)}
+        self.tags = [tuple(t) for t in data["tags"]]
+        self.tag_lookup = {t: i for i, t in enumerate(self.tags)}
+        self.player_bits = data["player_bits"]
+        self.duration_bits = data["duration_bits"]
+        self.tag_bits = data["tag_bits"]
+        self.realtime_bits = data["realtime_bits"]
+        self.turnbased_bits = data["turnbased_bits"]
+        self._weight_order = sorted(range(len(self.game_ids)), key=lambda p: data["weights"][p])
+        self._sorted_weights = [data["weights"][p] for p in self._weight_order]
+        self._weight_masks = {}
+        self.all_bits = (1 << len(self.game_ids)) - 1
+
+    @classmethod
+    def build(cls, games, source=None):
+        ids, names, display_names, weights, durations, game_tags = [], [], [], [], [], []
+        tags, tag_lookup, tag_bits = [], {}, []
+        player_bits, duration_bits = {}, {}
+        realtime_bits = turnbased_bits = 0
+
+        for pos, g in enumerate(games):
+            bit = 1 << pos
+            ids.append(str(g["id"]))
+            names.append(g.get("name"))
+            display_names.append(g.get("display_name_en"))
+            weights.append(g.get("weight") or 0)
+            durations.append(g.get("average_duration"))
+
+            lo, hi = g.get("min_player_number"), g.get("max_player_number")
+            if lo is not None and hi is not None:
+                for n in range(lo, hi + 1):
+                    player_bits[n] = player_bits.get(n, 0) | bit
+
+            bucket = duration_bucket(g.get("average_duration"))
+            if bucket:
+                duration_bits[bucket] = duration_bits.get(bucket, 0) | bit
+            if g.get("realtime") == "yes":
+                realtime_bits |= bit
+            if g.get("turnbased") == "yes":
+                turnbased_bits |= bit
+
+            own_tags = []
+            for t in g.get("tags") or []:
+                if "name" not in t:
+                    continue
+                key = (t["name"], t.get("category") or "")
+                if key not in tag_lookup:
+                    tag_lookup[key] = len(tags)
+                    tags.append(key)
+                    tag_bits.append(0)
+                tag_id = tag_lookup[key]
+                tag_bits[tag_id] |= bit
+                own_tags.append(tag_id)
+            game_tags.append(own_tags)
+
+        return cls({
+            "version": CATALOGUE_INDEX_VERSION,
+            "source": source,
+            "ids": ids,
+            "names": names,
+            "display_names": display_names,
+            "weights": weights,
+            "durations": durations,
+            "game_tags": game_tags,
+            "tags": tags,
+            "tag_bits": tag_bits,
+            "player_bits": player_bits,
+            "duration_bits": duration_bits,
+            "realtime_bits": realtime_bits,
+            "turnbased_bits": turnbased_bits,
+        })
+
+    @classmethod
+    def load(cls, path, source=None):
+        """Load a saved index, or None if it is missing, outdated or built from another catalogue."""
+        data = load_binary(path)
+        if data is None:
+            return None
+        if data.get("version") != CATALOGUE_INDEX_VERSION or (source is not None and data.get("source") != source):
+            return None
+        return cls(data)
+
+    def save(self, path):
+        save_binary(path, self.data)
+
+    # --- Masks ---
+
+    def mask_of(self, game_ids):
+        mask = 0
+        for gid in game_ids:
+            pos = self.positions.get(str(gid))
+            if pos is not None:
+                mask |= 1 << pos
+        return mask
+
+    def players(self, n):
+        return self.player_bits.get(n, 0)
+
+    def weight_at_least(self, min_weight):
+        if min_weight not in self._weight_masks:
+            mask = 0
+            for pos in self._weight_order[bisect.bisect_left(self._sorted_weights, min_weight):]:
+                mask |= 1 << pos
+            self._weight_masks[min_weight] = mask
+        return self._weight_masks[min_weight]
+
+    def duration(self, bucket):
+        return self.duration_bits.get(bucket, 0)
+
+    def tag_ids(self, name=None, category=None):
+        return [
+            i for i, (tag_name, tag_category) in enumerate(self.tags)
+            if (name is None or tag_name == name) and (category is None or tag_category == category)
+        ]
+
+    def tagged(self, names=None, category=None):
+        """Games carrying any of the tags ``names`` (optionally restricted to ``category``)."""
+        mask = 0
+        for name in names if names is not None else [None]:
+            for tag_id in self.tag_ids(name, category):
+                mask |= self.tag_bits[tag_id]
+        return mask
+
+    def query(self, players=None, min_weight=None, duration=None, tags_any=None, tag_category=None,
+              realtime=None, turnbased=None, exclude_ids=None):
+        mask = self.all_bits
+        if players is not None:
+            mask &= self.players(players)
+        if min_weight is not None:
+            mask &= self.weight_at_least(min_weight)
+        if duration is not None:
+            mask &= self.duration(duration)
+        if tags_any is not None or tag_category is not None:
+            mask &= self.tagged(tags_any, tag_category)
+        if realtime:
+            mask &= self.realtime_bits
+        if turnbased:
+            mask &= self.turnbased_bits
+        if exclude_ids:
+            mask &= ~self.mask_of(exclude_ids)
+        return mask
+
+    # --- Results ---
+
+    def positions_of(self, mask):
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def ids(self, mask):
+        return [self.game_ids[pos] for pos in self.positions_of(mask)]
+
+    def game(self, game_id):
+        """The fields suggestions need for one game."""
+        pos = self.positions[str(game_id)]
+        return {
+            "id": self.game_ids[pos],
+            "name": self.data["names"][pos],
+            "display_name_en": self.data["display_names"][pos],
+            "weight": self.data["weights"][pos],
+            "average_duration": self.data["durations"][pos],
+            "tags": [{"name": self.tags[t][0], "category": self.tags[t][1]} for t in self.data["game_tags"][pos]],
+        }
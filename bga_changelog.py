@@ -0,0 +1,86 @@
+"""What changed in the BGA catalogue between pulls.
+
+``diff_catalogue`` compares two game lists by ``id``. It reports games
+added, games removed, and games whose tracked metadata changed, with the
+fields that changed. Counters that move on every pull, such as
+``games_played``, are not tracked.
+
+Each pull that changes something appends one line to the changelog. A line
+records the time and the ids in the delta, so "what was added this week"
+only needs the lines since then, with no comparison of catalogues.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+# Fields whose change is worth recording (and telling downstream indexes about)
+TRACKED_FIELDS = (
+    "name", "display_name_en", "status", "premium", "weight", "average_duration",
+    "player_numbers", "realtime", "turnbased", "tags", "aliases", "published_on",
+)
+# Fields the raw tag ids are resolved from; a game is only re-resolved if these change
+RESOLVED_FIELDS = ("tags", "player_numbers")
+
+
+def fingerprint(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def diff_catalogue(old_games, new_games):
+    """``{"added": [ids], "removed": [ids], "changed": {id: [fields]}}`` between two game lists."""
+    old = {str(g["id"]): g for g in old_games}
+    new = {str(g["id"]): g for g in new_games}
+    changed = {}
+    for gid, game in new.items():
+        before = old.get(gid)
+        if before is None:
+            continue
+        fields = [f for f in TRACKED_FIELDS if before.get(f) != game.get(f)]
+        if fields:
+            changed[gid] = fields
+    return {
+        "added": [gid for gid in new if gid not in old],
+        "removed": [gid for gid in old if gid not in new],
+        "changed": changed,
+    }
+
+
+class CatalogueChangelog:
+    """Append-only log of catalogue deltas, one JSON object per line, oldest first."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted append
+                    continue
+        return entries
+
+    def append(self, delta, at=None):
+        entry = dict(delta, at=(at or datetime.now(timezone.utc)).isoformat())
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def added_since(self, since):
+        """Ids added after ``since`` (an aware datetime) and not removed again, oldest first."""
+        added = {}
+        for entry in self.entries():
+            if datetime.fromisoformat(entry["at"]) < since:
+                continue
+            for gid in entry.get("added", []):
+                added[gid] = entry["at"]
+            for gid in entry.get("removed", []):
+                added.pop(gid, None)
+        return list(added)
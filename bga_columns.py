@@ -0,0 +1,138 @@
+"""Columnar view of the play history, for vectorized aggregation.
+
+``HistoryColumns.from_tables`` parses each table's comma-joined
+``player_names``, ``ranks`` and ``scores`` once, interning game names, game ids and
+players to integer codes. The result has one row per table and one row per
+(table, player) pair in a long table, all as NumPy arrays, so aggregates
+become group-by reductions (``bincount``, ``unique``, ``ufunc.at``) instead
+of nested dict updates.
+
+NumPy is optional: ``available()`` is False without it, and callers fall
+back to their per-entry code.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def available():
+    return np is not None
+
+
+class HistoryColumns:
+    """Parallel arrays over a history, oldest table first.
+
+    Per table: ``game`` (code into ``game_names``), ``game_id`` (code into
+    ``game_ids``), ``end``, ``duration`` (whole minutes, -1 if unknown) and
+    ``year`` (calendar year of ``end`` in UTC, -1 if unknown).
+
+    Per (table, player) row: ``table`` (index of the table), ``pos``
+    (position among the table's named players), ``player`` (code into
+    ``players``), ``rank``, ``has_rank``, ``score`` and ``has_score``.
+    """
+
+    def __init__(self, game_names, game_ids, players, tables, rows):
+        self.game_names = game_names
+        self.game_ids = game_ids
+        self.players = players
+        self.game, self.game_id, self.end, self.duration, self.year = tables
+        self.table, self.pos, self.player, self.rank, self.has_rank, self.score, self.has_score = rows
+
+    def __len__(self):
+        return len(self.end)
+
+    @classmethod
+    def from_tables(cls, tables, players=None):
+        """Parse ``tables`` (oldest first) into columns.
+
+        With ``players`` (a set of names), only their (table, player) rows are
+        kept; ``pos`` still counts every named player at the table.
+        """
+        game_codes, game_id_codes, player_codes = {}, {}, {}
+        game, game_id, start, end = [], [], [], []
+        row_table, row_pos, row_player, row_rank, row_has_rank, row_score, row_has_score = [], [], [], [], [], [], []
+        for t, entry in enumerate(tables):
+            game.append(game_codes.setdefault(entry.get("game_name", ""), len(game_codes)))
+            game_id.append(game_id_codes.setdefault(str(entry.get("game_id", "")), len(game_id_codes)))
+            start.append(int(entry.get("start") or 0))
+            end.append(int(entry.get("end") or 0))
+            ranks = entry.get("ranks", "").split(",")
+            scores = entry.get("scores", "").split(",")
+            pos = 0
+            for name in entry.get("player_names", "").split(","):
+                name = name.strip()
+                if not name:
+                    continue
+                if players is not None and name not in players:
+                    pos += 1
+                    continue
+                try:
+                    rank = int(ranks[pos])
+                    has_rank = True
+                except (IndexError, ValueError):
+                    rank, has_rank = 0, False
+                try:
+                    score = int(scores[pos])
+                    has_score = True
+                except (IndexError, ValueError):
+                    score, has_score = 0, False
+                row_table.append(t)
+                row_pos.append(pos)
+                row_player.append(player_codes.setdefault(name, len(player_codes)))
+                row_rank.append(rank)
+                row_has_rank.append(has_rank)
+                row_score.append(score)
+                row_has_score.append(has_score)
+                pos += 1
+
+        start = np.array(start, dtype=np.int64)
+        end = np.array(end, dtype=np.int64)
+        # round() on the float minutes, which rounds halves to even like np.rint
+        duration = np.where(end > start, np.rint((end - start) / 60), -1).astype(np.int64)
+        year = np.where(end > 0, end.astype("datetime64[s]").astype("datetime64[Y]").astype(np.int64) + 1970, -1)
+        return cls(
+            list(game_codes), list(game_id_codes), list(player_codes),
+            (np.array(game, dtype=np.int64), np.array(game_id, dtype=np.int64), end, duration, year),
+            (
+                np.array(row_table, dtype=np.int64),
+                np.array(row_pos, dtype=np.int64),
+                np.array(row_player, dtype=np.int64),
+                np.array(row_rank, dtype=np.int64),
+                np.array(row_has_rank, dtype=bool),
+                np.array(row_score, dtype=np.int64),
+                np.array(row_has_score, dtype=bool),
+            ),
+        )
+
+
+class GroupBy:
+    """Group integer ``keys``; reductions return one value per group, in key order."""
+
+    def __init__(self, keys):
+        self.keys, self.inverse = np.unique(keys, return_inverse=True)
+        self.size = len(self.keys)
+
+    def count(self, mask=None):
+        inverse = self.inverse if mask is None else self.inverse[mask]
+        return np.bincount(inverse, minlength=self.size)
+
+    def sum(self, values, mask=None):
+        inverse, values = (self.inverse, values) if mask is None else (self.inverse[mask], values[mask])
+        return np.bincount(inverse, weights=values, minlength=self.size).astype(np.int64)
+
+    def last(self, order):
+        """Largest ``order`` value in each group (e.g. the index of the last row)."""
+        out = np.full(self.size, -1, dtype=np.int64)
+        np.maximum.at(out, self.inverse, order)
+        return out
+
+    def min(self, values, mask):
+        out = np.full(self.size, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(out, self.inverse[mask], values[mask])
+        return out
+
+    def max(self, values, mask):
+        out = np.full(self.size, np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(out, self.inverse[mask], values[mask])
+        return out
@@ -0,0 +1,347 @@
+"""Long-running ``serve`` mode.
+
+``python cli.py serve`` keeps one process alive instead of starting cold for
+every cron job. History, the catalogue index, stats and past suggestions
+stay memoized by ``bga_data`` (reloaded only if their files change on disk)
+and the BGA login is reused until BGA rejects it. Pulls and the weekly
+suggestion post run on an internal schedule:
+
+- ``history`` every ``BGA_SERVE_HISTORY_HOURS`` (default 6)
+- ``games`` every ``BGA_SERVE_GAMES_HOURS`` (default 24)
+- ``suggest`` weekly at ``BGA_SERVE_SUGGEST_AT`` (default ``mon 18:00``,
+  local time), sent via Signal when served with ``--signal``
+- ``outbox`` every ``BGA_SERVE_OUTBOX_MINUTES`` (default 15) with
+  ``--signal``, retrying Signal messages that could not be delivered
+
+Queries are answered as JSON over localhost HTTP (``--listen
+127.0.0.1:8766``) or a Unix socket (``--listen unix:/path/to.sock``)::
+
+    GET  /status                          job schedule, uptime, data sizes
+    GET  /stats  /stats/<player>          bga_stats.json, or one player's block
+    GET  /stats?from=&to=                 stats for a date range (as ``stats --from/--to``)
+    GET  /rivals  /rivals/<player>        head-to-head records from bga_stats.json
+    GET  /history?limit=&player=&game=    recent tables, newest first (game by id or name)
+    GET  /games/<id>                      one catalogue entry
+    GET  /search?q=&limit=                games matching a name, best first
+    GET  /suggestion                      the last weekly suggestion
+    POST /run/<job>                       run a job now
+
+Job times and the last suggestion are kept in storage/daemon_state.json.
+On SIGINT/SIGTERM the server stops, any running job is allowed to finish,
+and the state, session cookies and history store are flushed.
+"""
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import bga_data
+import bga_functions
+from bga_data import DAEMON_STATE_FILE, load_env
+from bga_storage import save_json
+
+DEFAULT_LISTEN = "127.0.0.1:8766"
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def _now():
+    return datetime.now().astimezone()
+
+
+def _parse_weekly(spec):
+    """``"mon 18:00"`` -> ``(0, 18, 0)``."""
+    day, _, clock = spec.strip().lower().partition(" ")
+    hour, _, minute = clock.partition(":")
+    return WEEKDAYS.index(day[:3]), int(hour), int(minute or 0)
+
+
+def _next_weekly(after, weekday, hour, minute):
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    candidate += timedelta(days=(weekday - candidate.weekday()) % 7)
+    if candidate <= after:
+        candidate += timedelta(days=7)
+    return candidate
+
+
+class Job:
+    """A scheduled job: every ``every`` (a timedelta) or weekly at ``weekly``."""
+
+    def __init__(self, name, fn, every=None, weekly=None):
+        self.name = name
+        self.fn = fn
+        self.every = every
+        self.weekly = weekly
+        self.last_run = None
+        self.last_status = None
+        self.last_duration_s = None
+        self.requested = False
+
+    def next_run(self, started):
+        if self.requested:
+            return started
+        if self.every is not None:
+            # Interval jobs run straight away on a fresh start
+            return self.last_run + self.every if self.last_run else started
+        return _next_weekly(self.last_run or started, *self.weekly)
+
+    def to_json(self):
+        return {
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_status": self.last_status,
+            "last_duration_s": self.last_duration_s,
+        }
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _make_handler(daemon):
+    class Handler(BaseHTTPRequestHandler):
+        def _handle(self):
+            parts = urlsplit(self.path)
+            query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+            try:
+                status, body = daemon.route(self.command, parts.path, query)
+            except Exception as e:
+                traceback.print_exc()
+                status, body = 500, {"error": str(e)}
+            payload = json.dumps(body, indent=2).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = _handle
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+class Daemon:
+    def __init__(self, awards_only=False, send_signal=False):
+        env = load_env()
+        self.awards_only = awards_only
+        self.send_signal = send_signal
+        self.jobs = {
+            "history": Job(
+                "history", bga_functions.pull_player_history,
+                every=timedelta(hours=float(env.get("BGA_SERVE_HISTORY_HOURS", 6))),
+            ),
+            "games": Job(
+                "games", bga_functions.pull_game_list,
+                every=timedelta(hours=float(env.get("BGA_SERVE_GAMES_HOURS", 24))),
+            ),
+            "suggest": Job(
+                "suggest", self._suggest,
+                weekly=_parse_weekly(env.get("BGA_SERVE_SUGGEST_AT", "mon 18:00")),
+            ),
+        }
+        if send_signal:
+            self.jobs["outbox"] = Job(
+                "outbox", bga_functions.flush_signal_outbox,
+                every=timedelta(minutes=float(env.get("BGA_SERVE_OUTBOX_MINUTES", 15))),
+            )
+        self.last_suggestion = None
+        self.running = None
+        self.started = _now()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._load_state()
+
+    def _load_state(self):
+        if not os.path.exists(DAEMON_STATE_FILE):
+            return
+        with open(DAEMON_STATE_FILE, "r") as f:
+            state = json.load(f)
+        for name, saved in state.get("jobs", {}).items():
+            job = self.jobs.get(name)
+            if job is None:
+                continue
+            job.last_run = datetime.fromisoformat(saved["last_run"]) if saved.get("last_run") else None
+            job.last_status = saved.get("last_status")
+            job.last_duration_s = saved.get("last_duration_s")
+        self.last_suggestion = state.get("last_suggestion")
+
+    def _save_state(self):
+        state = {
+            "jobs": {name: job.to_json() for name, job in self.jobs.items()},
+            "last_suggestion": self.last_suggestion,
+        }
+        save_json(DAEMON_STATE_FILE, state, indent=2)
+
+    def _suggest(self):
+        message = bga_functions.suggest_games(awards_only=self.awards_only)
+        self.last_suggestion = {"at": _now().isoformat(), "message": message}
+        if self.send_signal:
+            bga_functions.send_signal_message(message)
+
+    # Scheduler
+
+    def _run_job(self, job):
+        print(f"[serve] Running {job.name}...")
+        job.requested = False
+        self.running = job.name
+        start = time.perf_counter()
+        try:
+            job.fn()
+            job.last_status = "ok"
+        except Exception as e:
+            traceback.print_exc()
+            job.last_status = f"error: {e}"
+        job.last_run = _now()
+        job.last_duration_s = round(time.perf_counter() - start, 3)
+        self.running = None
+        self._save_state()
+        print(f"[serve] {job.name} finished ({job.last_status}) in {job.last_duration_s}s.")
+
+    def _run_scheduler(self):
+        while not self._stop.is_set():
+            due = [job for job in self.jobs.values() if job.next_run(self.started) <= _now()]
+            for job in due:
+                if self._stop.is_set():
+                    return
+                self._run_job(job)
+            if due:
+                continue
+            wait = min(job.next_run(self.started) for job in self.jobs.values()) - _now()
+            self._wake.wait(max(0.0, min(wait.total_seconds(), 3600)))
+            self._wake.clear()
+
+    # Queries
+
+    def status(self):
+        store = bga_data.get_history_store()
+        index = bga_data.get_catalogue_index()
+        return {
+            "started_at": self.started.isoformat(),
+            "uptime_s": round((_now() - self.started).total_seconds(), 1),
+            "history_games": len(store),
+            "catalogue_games": len(index.game_ids) if index else 0,
+            "running": self.running,
+            "jobs": {
+                name: dict(job.to_json(), next_run=job.next_run(self.started).isoformat())
+                for name, job in self.jobs.items()
+            },
+        }
+
+    def route(self, method, path, query):
+        parts = [p for p in path.split("/") if p]
+        if method == "POST":
+            if len(parts) == 2 and parts[0] == "run" and parts[1] in self.jobs:
+                self.jobs[parts[1]].requested = True
+                self._wake.set()
+                return 202, {"queued": parts[1]}
+            return 404, {"error": f"Unknown job: {path}"}
+
+        if parts == ["status"]:
+            return 200, self.status()
+        if parts == ["stats"] and ("from" in query or "to" in query):
+            try:
+                return 200, bga_functions.stats_between(query.get("from"), query.get("to"))
+            except bga_functions.InvalidDate as e:
+                return 400, {"error": str(e)}
+        if parts[:1] == ["stats"] and len(parts) <= 2:
+            stats = bga_data.get_stats()
+            if stats is None:
+                return 404, {"error": "No stats generated yet"}
+            if len(parts) == 1:
+                return 200, stats
+            player = stats["per_player"].get(parts[1])
+            return (200, player) if player else (404, {"error": f"Unknown player: {parts[1]}"})
+        if parts[:1] == ["rivals"] and len(parts) <= 2:
+            stats = bga_data.get_stats()
+            if stats is None or "head_to_head" not in stats:
+                return 404, {"error": "No stats generated yet"}
+            if len(parts) == 1:
+                return 200, stats["head_to_head"]
+            rivals = stats["head_to_head"].get(parts[1])
+            return (200, rivals) if rivals else (404, {"error": f"Unknown player: {parts[1]}"})
+        if parts == ["history"]:
+            limit = int(query.get("limit", 20))
+            if "player" in query:
+                tables = bga_data.get_history_store().by_player(query["player"])
+            elif "game" in query:
+                game_id = bga_functions.find_game(query["game"])
+                tables = bga_data.get_history_store().by_game(game_id) if game_id else []
+            else:
+                tables = bga_data.get_history()
+            return 200, tables[:limit]
+        if len(parts) == 2 and parts[0] == "games":
+            index = bga_data.get_catalogue_index()
+            if index is None or parts[1] not in index.positions:
+                return 404, {"error": f"Unknown game: {parts[1]}"}
+            return 200, index.game(parts[1])
+        if parts == ["search"]:
+            matches = bga_functions.get_search_index().search(query.get("q", ""), limit=int(query.get("limit", 10)))
+            return 200, [{"id": gid, "display_name": name, "score": score} for gid, name, score in matches]
+        if parts == ["suggestion"]:
+            if self.last_suggestion is None:
+                return 404, {"error": "No suggestion posted yet"}
+            return 200, self.last_suggestion
+        return 404, {"error": f"Unknown path: {path}"}
+
+    # Lifecycle
+
+    def _make_server(self, listen):
+        handler = _make_handler(self)
+        if listen.startswith("unix:"):
+            path = listen[len("unix:"):]
+            if os.path.exists(path):
+                os.remove(path)
+            return _UnixHTTPServer(path, handler)
+        host, _, port = listen.rpartition(":")
+        return ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+
+    def run(self, listen=DEFAULT_LISTEN):
+        # Warm the in-memory caches before answering queries
+        bga_data.get_history()
+        bga_data.get_catalogue_index()
+        bga_data.get_stats()
+        bga_functions.get_range_index()
+        bga_functions.get_search_index()
+
+        server = self._make_server(listen)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        scheduler_thread = threading.Thread(target=self._run_scheduler)
+
+        def request_stop(signum, frame):
+            self._stop.set()
+            self._wake.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        server_thread.start()
+        scheduler_thread.start()
+        print(f"[serve] Listening on {listen}. Jobs: " + ", ".join(
+            f"{name} next at {job.next_run(self.started):%a %d %b %H:%M}" for name, job in self.jobs.items()
+        ))
+        while not self._stop.wait(1):
+            pass
+
+        print("[serve] Shutting down...")
+        server.shutdown()
+        server.server_close()
+        if listen.startswith("unix:") and os.path.exists(listen[len("unix:"):]):
+            os.remove(listen[len("unix:"):])
+        if self.running:
+            print(f"[serve] Waiting for {self.running} to finish...")
+        scheduler_thread.join()
+        self._save_state()
+        bga_functions.persist_session()
+        bga_data.close_history_store()
+        print("[serve] State saved.")
+
+
+def serve(listen=DEFAULT_LISTEN, awards_only=False, send_signal=False):
+    Daemon(awards_only=awards_only, send_signal=send_signal).run(listen)
@@ -0,0 +1,222 @@
+"""Shared, memoized access to the files the BGA tools read.
+
+Each loader caches its result per process and reuses it until the file
+behind it changes size or mtime, so one CLI run (or a long-running process)
+parses each file at most once. Nothing heavy is imported here, and the
+``.env`` file is only read when something asks for configuration.
+"""
+import os
+import threading
+
+import bga_profile
+from bga_catalogue import CatalogueIndex
+from bga_history_store import open_history_store
+from bga_ledger import SuggestionLedger
+from bga_storage import Document, file_signature, load_json
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Data files live next to the code unless BGA_DATA_DIR points elsewhere
+# (benchmarks and throwaway runs use this to work on a copy).
+DATA_DIR = os.environ.get("BGA_DATA_DIR", BASE_DIR)
+STORAGE_DIR = os.path.join(DATA_DIR, "storage")
+os.makedirs(STORAGE_DIR, exist_ok=True)
+
+SESSION_FILE = os.path.join(DATA_DIR, "storage/bga_session.json")
+PAST_SUGGESTIONS_FILE = os.path.join(DATA_DIR, "storage/past_suggestions.json")
+SUGGESTION_LEDGER_FILE = os.path.join(DATA_DIR, "storage/suggestion_ledger.jsonl")
+HISTORY_FILE = os.path.join(DATA_DIR, "bga_history.json")
+HISTORY_DB_FILE = os.path.join(DATA_DIR, "storage/history.db")
+HISTORY_BACKFILL_FILE = os.path.join(DATA_DIR, "storage/history_backfill.json")
+HISTORY_SYNC_FILE = os.path.join(DATA_DIR, "storage/history_sync.json")
+GAMES_FILE = os.path.join(DATA_DIR, "bga_games.json")
+GAMES_DATA_FILE = os.path.join(DATA_DIR, "storage/games.bin")
+CATALOGUE_INDEX_FILE = os.path.join(DATA_DIR, "storage/catalogue_index.bin")
+CATALOGUE_FINGERPRINTS_FILE = os.path.join(DATA_DIR, "storage/catalogue_fingerprints.bin")
+CATALOGUE_CHANGELOG_FILE = os.path.join(DATA_DIR, "storage/catalogue_changelog.jsonl")
+NEIGHBOUR_INDEX_FILE = os.path.join(DATA_DIR, "storage/neighbour_index.bin")
+SEARCH_INDEX_FILE = os.path.join(DATA_DIR, "storage/search_index.bin")
+STATS_FILE = os.path.join(DATA_DIR, "bga_stats.json")
+STATS_DATA_FILE = os.path.join(DATA_DIR, "storage/stats.bin")
+STATS_STATE_FILE = os.path.join(DATA_DIR, "storage/stats_state.bin")
+STATS_RANGES_FILE = os.path.join(DATA_DIR, "storage/stats_ranges.bin")
+FORGOTTEN_INDEX_FILE = os.path.join(DATA_DIR, "storage/forgotten_index.bin")
+HTTP_CACHE_DIR = os.path.join(DATA_DIR, "storage/http_cache")
+DAEMON_STATE_FILE = os.path.join(DATA_DIR, "storage/daemon_state.json")
+SIGNAL_OUTBOX_DIR = os.path.join(DATA_DIR, "storage/signal_outbox")
+
+# The catalogue and stats are read from their binary copies; the JSON files
+# are exports for humans, imported back if edited by hand.
+GAMES = Document(GAMES_DATA_FILE, GAMES_FILE, indent=2)
+STATS = Document(STATS_DATA_FILE, STATS_FILE, indent=2)
+GAMES_FILES = (GAMES_DATA_FILE, GAMES_FILE)
+STATS_FILES = (STATS_DATA_FILE, STATS_FILE)
+
+_lock = threading.RLock()
+_cache = {}  # key -> (file signature, value)
+_env_loaded = False
+_history_store = None
+
+
+def load_env():
+    """Read ``.env`` into the environment, once per process."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(BASE_DIR, ".env"))
+        _env_loaded = True
+    return os.environ
+
+
+def _signature(path):
+    if isinstance(path, tuple):
+        return tuple(file_signature(p) for p in path)
+    return file_signature(path)
+
+
+def memoized(key, path, loader):
+    """Return ``loader()``, cached under ``key`` until ``path`` (or any of a tuple of paths) changes."""
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == _signature(path):
+            return hit[1]
+        value = loader()
+        # Loaders may create or rebuild the file, so sign what they left behind
+        _cache[key] = (_signature(path), value)
+        return value
+
+
+def invalidate(key=None):
+    with _lock:
+        if key is None:
+            _cache.clear()
+        else:
+            _cache.pop(key, None)
+
+
+def get_history_store():
+    """The history store, created from bga_history.json on first use."""
+    global _history_store
+    with _lock:
+        if _history_store is None:
+            _history_store = open_history_store(HISTORY_DB_FILE, legacy_json=HISTORY_FILE)
+        return _history_store
+
+
+def close_history_store():
+    global _history_store
+    with _lock:
+        if _history_store is not None:
+            _history_store.close()
+            _history_store = None
+
+
+def get_history():
+    """Every table in the history store, newest first."""
+    store = get_history_store()
+
+    def load():
+        with bga_profile.phase("json.load history rows", category="json"):
+            return store.all()
+    return memoized("history", HISTORY_DB_FILE, load)
+
+
+def _load_json(path, default):
+    with bga_profile.phase(f"json.load {os.path.basename(path)}", category="json"):
+        return load_json(path, default)
+
+
+def _json_export():
+    # "off" keeps only the binary copies of the catalogue and stats
+    return load_env().get("BGA_JSON_EXPORT", "on") != "off"
+
+
+def _load_document(document, default):
+    with bga_profile.phase(f"load {os.path.basename(document.path)}", category="storage"):
+        return document.load(default)
+
+
+def _save_document(key, document, data):
+    with _lock:
+        with bga_profile.phase(f"dump {os.path.basename(document.path)}", category="storage"):
+            document.save(data, export=_json_export())
+        _cache[key] = (_signature((document.path, document.export_path)), data)
+
+
+def get_catalogue():
+    return memoized("catalogue", GAMES_FILES, lambda: _load_document(GAMES, []))
+
+
+def save_catalogue(game_list):
+    _save_document("catalogue", GAMES, game_list)
+
+
+def catalogue_source():
+    """Signature of the saved catalogue, which derived indexes record to tell when they are outdated."""
+    return GAMES.signature() if GAMES.exists() else None
+
+
+def _load_catalogue_index():
+    source = catalogue_source()
+    if source is None:
+        return None
+    with bga_profile.phase("load catalogue_index.bin", category="storage"):
+        index = CatalogueIndex.load(CATALOGUE_INDEX_FILE, source=source)
+    if index is None:
+        index = CatalogueIndex.build(get_catalogue(), source=source)
+        with bga_profile.phase("dump catalogue_index.bin", category="storage"):
+            index.save(CATALOGUE_INDEX_FILE)
+    return index
+
+
+def get_catalogue_index():
+    """The catalogue index, rebuilt if the catalogue has changed since it was saved."""
+    return memoized("catalogue_index", GAMES_FILES, _load_catalogue_index)
+
+
+def get_display_names():
+    """game_id -> English display name, read from the catalogue index."""
+    def load():
+        index = get_catalogue_index()
+        if index is None:
+            return {}
+        return dict(zip(index.game_ids, index.data["display_names"]))
+    return memoized("display_names", GAMES_FILES, load)
+
+
+def get_stats():
+    """The last stats written."""
+    return memoized("stats", STATS_FILES, lambda: _load_document(STATS, None))
+
+
+def save_stats(stats):
+    _save_document("stats", STATS, stats)
+
+
+def _load_suggestion_ledger():
+    # Days before a suggested game can be suggested again; "forever" never expires
+    cooldown = load_env().get("BGA_SUGGEST_COOLDOWN_DAYS", "365")
+    first_use = not os.path.exists(SUGGESTION_LEDGER_FILE)
+    with bga_profile.phase("json.load suggestion_ledger.jsonl", category="json"):
+        ledger = SuggestionLedger(SUGGESTION_LEDGER_FILE, cooldown_days=None if cooldown == "forever" else int(cooldown))
+    if first_use:
+        if os.path.exists(PAST_SUGGESTIONS_FILE):
+            past_suggestions = _load_json(PAST_SUGGESTIONS_FILE, [])
+            ledger.append(past_suggestions)
+            print(f"Imported {len(past_suggestions)} past suggestions from {PAST_SUGGESTIONS_FILE} into {SUGGESTION_LEDGER_FILE}.")
+        # The ledger file marks the import as done, even when there was nothing to import
+        open(SUGGESTION_LEDGER_FILE, "a").close()
+    return ledger
+
+
+def get_suggestion_ledger():
+    """The suggestion ledger, created from past_suggestions.json on first use."""
+    return memoized("suggestion_ledger", SUGGESTION_LEDGER_FILE, _load_suggestion_ledger)
+
+
+def record_suggestions(suggestions):
+    """Append ``suggestions`` to the ledger, keeping the in-memory copy current."""
+    with _lock:
+        ledger = get_suggestion_ledger()
+        with bga_profile.phase("json.dump suggestion_ledger.jsonl", category="json"):
+            ledger.append(suggestions)
+        _cache["suggestion_ledger"] = (file_signature(SUGGESTION_LEDGER_FILE), ledger)
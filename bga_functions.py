@@ -1,32 +1,78 @@
-import requests
 import json
+import math
 import random
 import re
+import threading
 import time
 import os
 from datetime import datetime, timedelta, timezone
-from dotenv import load_dotenv
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-load_dotenv(os.path.join(BASE_DIR, ".env"))
-
-BGA_EMAIL = os.environ["BGA_EMAIL"]
-BGA_PASSWORD = os.environ["BGA_PASSWORD"]
-BGA_PLAYER_ID = os.environ["BGA_PLAYER_ID"]
+from itertools import islice
+import bga_profile
+from bga_profile import profiled
+from bga_scheduler import RequestScheduler
+from bga_http_cache import HTTPCache, body_digest
+from bga_catalogue import CatalogueIndex, DURATION_BUCKETS
+from bga_groups import GroupPlayIndex
+from bga_ranges import RangeIndex
+from bga_outbox import Outbox
+from bga_session import AuthError, SessionManager
+from bga_changelog import RESOLVED_FIELDS, CatalogueChangelog, diff_catalogue, fingerprint
+from bga_search import NAME_FIELDS, GameSearchIndex
+from bga_similarity import FEATURE_FIELDS, NeighbourIndex
+from bga_storage import load_binary, save_binary, save_json
+from bga_data import (
+    BASE_DIR, SESSION_FILE, HISTORY_FILE,
+    HISTORY_BACKFILL_FILE, HISTORY_SYNC_FILE,
+    GAMES_FILE, GAMES_FILES, CATALOGUE_INDEX_FILE, CATALOGUE_FINGERPRINTS_FILE, CATALOGUE_CHANGELOG_FILE, SEARCH_INDEX_FILE, NEIGHBOUR_INDEX_FILE, STATS_FILE, STATS_STATE_FILE, STATS_RANGES_FILE, FORGOTTEN_INDEX_FILE,
+    HTTP_CACHE_DIR, SIGNAL_OUTBOX_DIR,
+    load_env, memoized, get_history_store, get_catalogue, get_catalogue_index, catalogue_source,
+    save_catalogue, get_display_names, get_stats, save_stats, get_suggestion_ledger, record_suggestions,
+)
+
+_scheduler = None
+_http_cache = None
+_session = None
+_session_manager = None
+_signal_outbox = None
+_signal_session = None
+# Words in a BGA error that mean the session or request token was rejected
+AUTH_ERROR_WORDS = ("logged", "login", "session", "token")
+SIGNAL_TIMEOUT = 15
+
+
+def _credentials():
+    env = load_env()
+    return env["BGA_EMAIL"], env["BGA_PASSWORD"], env["BGA_PLAYER_ID"]
+
+
+def _get_scheduler():
+    # Politeness budget for BGA: requests per second, burst size, and how many
+    # independent requests may be in flight at once.
+    global _scheduler
+    if _scheduler is None:
+        env = load_env()
+        _scheduler = RequestScheduler(
+            float(env.get("BGA_RATE", 0.5)),
+            burst=int(env.get("BGA_BURST", 1)),
+            workers=int(env.get("BGA_WORKERS", 4)),
+            observer=bga_profile.observe,
+        )
+    return _scheduler
 
-STORAGE_DIR = os.path.join(BASE_DIR, "storage")
-os.makedirs(STORAGE_DIR, exist_ok=True)
 
-SESSION_FILE = os.path.join(BASE_DIR, "storage/bga_session.json")
-PAST_SUGGESTIONS_FILE = os.path.join(BASE_DIR, "storage/past_suggestions.json")
-HISTORY_FILE = os.path.join(BASE_DIR, "bga_history.json")
-GAMES_FILE = os.path.join(BASE_DIR, "bga_games.json")
-STATS_FILE = os.path.join(BASE_DIR, "bga_stats.json")
+def _get_http_cache():
+    # Conditional-GET cache for BGA pages: "on", "readonly" (offline) or "off".
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = HTTPCache(HTTP_CACHE_DIR, mode=load_env().get("BGA_HTTP_CACHE", "on"))
+    return _http_cache
 
-BGA_TIMEOUT=2
 
 def _create_session():
-    session = requests.Session()
+    import requests
+    from bga_transport import configure_session
+
+    session = configure_session(requests.Session(), load_env())
     session.headers.update({
         "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:147.0) Gecko/20100101 Firefox/147.0",
         "Accept": "*/*",
@@ -35,103 +81,117 @@ def _create_session():
     return session
 
 
-def _load_session():
-    if not os.path.exists(SESSION_FILE):
-        return None
-    try:
-        with open(SESSION_FILE, "r") as f:
-            data = json.load(f)
-        saved_time = datetime.fromisoformat(data["datetime"])
-        age_hours = (datetime.now(timezone.utc) - saved_time).total_seconds() / 3600
-        if age_hours >= 24:
-            print("Saved session is older than 24 hours, logging in fresh.")
-            return None
-        print(f"Reusing saved session ({age_hours:.1f} hours old).")
-        return data
-    except (json.JSONDecodeError, KeyError, ValueError) as e:
-        print(f"Could not load saved session: {e}")
-        return None
+def _shared_session():
+    # One session per process, so every BGA call reuses its keep-alive connections
+    global _session
+    if _session is None:
+        _session = _create_session()
+    return _session
 
 
-def _save_session(cookie_jar):
-    cookies_list = [
-        {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path}
-        for c in cookie_jar
-    ]
-    data = {
-        "cookies": cookies_list,
-        "datetime": datetime.now(timezone.utc).isoformat(),
-    }
-    with open(SESSION_FILE, "w") as f:
-        json.dump(data, f, indent=2)
-    print(f"Session saved to {SESSION_FILE}")
+def _bga_request(session, method, url, **kwargs):
+    return _get_scheduler().request(session, method, url, **kwargs)
 
 
-def _extract_request_token(resp):
-    match = re.search(r"""requestToken['"]*\s*:\s*['"]([^'"]+)['"]""", resp.text)
+def _cached_get(session, url, **kwargs):
+    """GET a page through the HTTP cache. Returns ``(text, changed)``."""
+    def send(method, u, **kw):
+        return _bga_request(session, method, u, **kw)
+    return _get_http_cache().get(send, url, **kwargs)
+
+
+def _extract_request_token(text):
+    match = re.search(r"""requestToken['"]*\s*:\s*['"]([^'"]+)['"]""", text)
     if match:
         return match.group(1)
     return None
 
 
-def _login(email, password):
-    session = _create_session()
-    saved = _load_session()
-    if saved:
-        for c in saved["cookies"]:
-            session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
-    else:
-        print("Fetching login page for CSRF token...")
-        resp = session.get("https://en.boardgamearena.com/account")
-        time.sleep(BGA_TIMEOUT)
-        login_request_token = _extract_request_token(resp)
-
-        print("Checking username...")
-        session.post(
-            "https://en.boardgamearena.com/account/register/checkUserNameIsInUse.html",
-            headers={
-                "X-Request-Token": login_request_token,
-                "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8",
-                "Referer": "https://en.boardgamearena.com/account",
-            },
-            data={"username": email},
-        )
-        time.sleep(BGA_TIMEOUT)
-
-        print("Logging in...")
-        login_resp = session.post(
-            "https://en.boardgamearena.com/account/auth/loginUserWithPassword.html",
-            headers={
-                "X-Request-Token": login_request_token,
-                "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8",
-                "Referer": "https://en.boardgamearena.com/account?step=2&page=login",
-            },
-            data={
-                "username": email,
-                "password": password,
-                "remember_me": "false",
-                "request_token": login_request_token,
-            },
-        )
-        time.sleep(BGA_TIMEOUT)
-        login_data = login_resp.json()
-        if login_data.get("status") != 1:
-            raise Exception(f"Login failed: {login_data}")
-        login_result = login_data.get("data", {})
-        if not login_result.get("success"):
-            raise Exception(f"Login failed: {login_result.get('message', 'unknown error')}")
-        print("Logged in successfully!")
-        _save_session(session.cookies)
-
+def _fetch_request_token(session):
     print("Fetching fresh request token...")
-    resp = session.get("https://en.boardgamearena.com/account")
-    time.sleep(BGA_TIMEOUT)
-    request_token = _extract_request_token(resp)
-    return session, request_token
+    # The token is per session, so this page never goes through the HTTP cache
+    resp = _bga_request(session, "GET", "https://en.boardgamearena.com/account")
+    return _extract_request_token(resp.text)
+
+
+@profiled("login")
+def _authenticate(session):
+    email, password, _ = _credentials()
+    print("Fetching login page for CSRF token...")
+    login_request_token = _fetch_request_token(session)
 
+    print("Checking username...")
+    _bga_request(
+        session, "POST",
+        "https://en.boardgamearena.com/account/register/checkUserNameIsInUse.html",
+        headers={
+            "X-Request-Token": login_request_token,
+            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8",
+            "Referer": "https://en.boardgamearena.com/account",
+        },
+        data={"username": email},
+    )
+
+    print("Logging in...")
+    login_resp = _bga_request(
+        session, "POST",
+        "https://en.boardgamearena.com/account/auth/loginUserWithPassword.html",
+        headers={
+            "X-Request-Token": login_request_token,
+            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8",
+            "Referer": "https://en.boardgamearena.com/account?step=2&page=login",
+        },
+        data={
+            "username": email,
+            "password": password,
+            "remember_me": "false",
+            "request_token": login_request_token,
+        },
+    )
+    login_data = login_resp.json()
+    if login_data.get("status") != 1:
+        raise Exception(f"Login failed: {login_data}")
+    login_result = login_data.get("data", {})
+    if not login_result.get("success"):
+        raise Exception(f"Login failed: {login_result.get('message', 'unknown error')}")
+    print("Logged in successfully!")
+
+
+def _get_session_manager():
+    global _session_manager
+    if _session_manager is None:
+        _session_manager = SessionManager(SESSION_FILE, _shared_session, _authenticate, _fetch_request_token)
+    return _session_manager
+
+
+def persist_session():
+    """Write the in-memory login's cookies and request token back to the session file."""
+    if _session_manager is not None:
+        _session_manager.save()
+
+
+def _logged_in_call(fn, *args, **kwargs):
+    """Call ``fn(session, request_token, *args, **kwargs)``, logging in again once if BGA rejects the session."""
+    manager = _get_session_manager()
+    session, request_token = manager.get()
+    try:
+        return fn(session, request_token, *args, **kwargs)
+    except AuthError:
+        session, request_token = manager.reauthenticate(request_token)
+        return fn(session, request_token, *args, **kwargs)
 
+
+def _is_auth_failure(data):
+    if str(data.get("status")) != "0":
+        return False
+    error = str(data.get("error", "")).lower()
+    return any(word in error for word in AUTH_ERROR_WORDS)
+
+
+@profiled("history.page")
 def _get_games(session, request_token, player_id, page=1, count=10):
-    resp = session.get(
+    resp = _bga_request(
+        session, "GET",
         "https://boardgamearena.com/gamestats/gamestats/getGames.html",
         headers={"X-Request-Token": request_token},
         params={
@@ -144,45 +204,147 @@ def _get_games(session, request_token, player_id, page=1, count=10):
             "dojo.preventCache": int(time.time() * 1000),
         },
     )
-    time.sleep(BGA_TIMEOUT)
-    return resp.json()
+    if resp.status_code in (401, 403):
+        raise AuthError(f"HTTP {resp.status_code}")
+    data = resp.json()
+    if _is_auth_failure(data):
+        raise AuthError(data.get("error"))
+    return data
+
+
+_WHITESPACE = re.compile(r"\s*")
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR = re.compile(r'[^,}\]\s]+')
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+
+
+def _skip_json_value(text, pos):
+    """Return the index just past the JSON value starting at ``pos``, without building it."""
+    ch = text[pos]
+    if ch == '"':
+        match = _STRING.match(text, pos)
+        if not match:
+            raise json.JSONDecodeError("Unterminated string", text, pos)
+        return match.end()
+    if ch not in "{[":
+        match = _SCALAR.match(text, pos)
+        if not match:
+            raise json.JSONDecodeError("Expecting value", text, pos)
+        return match.end()
+    depth = 0
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if not match:
+            raise json.JSONDecodeError("Unterminated object", text, pos)
+        ch = match.group()
+        if ch == '"':
+            pos = _skip_json_value(text, match.start())
+            continue
+        depth += 1 if ch in "{[" else -1
+        pos = match.end()
+        if depth == 0:
+            return pos
+
+
+@profiled("games.parse", hotspots=True)
+def _extract_user_infos(text, keys=("game_list", "game_tags")):
+    """Pull only ``keys`` out of the globalUserInfos object embedded in a page.
+
+    Walks the object's top-level members in place, decoding wanted values and
+    skipping everything else by tracking string and bracket state, and stops
+    as soon as every wanted key has been seen. Returns None when the page has
+    no globalUserInfos object.
+    """
+    match = re.search(r'globalUserInfos\s*=\s*\{', text)
+    if not match:
+        return None
+    decoder = json.JSONDecoder()
+    wanted = set(keys)
+    found = {}
+    pos = match.end()
+    while wanted:
+        pos = _WHITESPACE.match(text, pos).end()
+        ch = text[pos:pos + 1]
+        if ch == "}" or not ch:
+            break
+        if ch == ",":
+            pos += 1
+            continue
+        if ch != '"':
+            raise json.JSONDecodeError("Expecting property name", text, pos)
+        key, pos = json.decoder.scanstring(text, pos + 1)
+        pos = _WHITESPACE.match(text, pos).end()
+        if text[pos:pos + 1] != ":":
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+        pos = _WHITESPACE.match(text, pos + 1).end()
+        if key in wanted:
+            found[key], pos = decoder.raw_decode(text, pos)
+            wanted.discard(key)
+        else:
+            pos = _skip_json_value(text, pos)
+    return found
 
 
 def pull_game_list():
-    session = _create_session()
-    session.headers["Accept"] = "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
+    """Pull the game catalogue. Returns False when the page is unchanged since the last saved pull.
 
+    The page's digest is saved with the catalogue fingerprints, after the
+    catalogue itself, so a pull that fails after the fetch is redone next
+    time even though the HTTP cache already holds the new page.
+    """
     print("Fetching BGA game list page...")
-    resp = session.get("https://en.boardgamearena.com/gamelist?section=all")
-    time.sleep(BGA_TIMEOUT)
-    resp.raise_for_status()
+    text, _ = _cached_get(
+        _shared_session(), "https://en.boardgamearena.com/gamelist?section=all",
+        headers={"Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"},
+    )
+    page_digest = body_digest(text)
+    saved_fingerprints = load_binary(CATALOGUE_FINGERPRINTS_FILE, {})
+    if saved_fingerprints.get("page") == page_digest and catalogue_source() is not None:
+        print("Game list page unchanged since last pull. Nothing to do.")
+        return False
 
     # The game_list is embedded inside a globalUserInfos JS object in the HTML.
-    match = re.search(r'globalUserInfos\s*=\s*(\{.*\})', resp.text)
-    if not match:
-        print("ERROR: Could not find globalUserInfos in page HTML.")
-        with open(os.path.join(BASE_DIR, "debug_gamelist.html"), "w") as f:
-            f.write(resp.text)
-        raise SystemExit(1)
-
-    raw_json = match.group(1)
-    decoder = json.JSONDecoder()
     try:
-        user_infos, _ = decoder.raw_decode(raw_json)
+        user_infos = _extract_user_infos(text)
     except json.JSONDecodeError as e:
         print(f"ERROR: Failed to parse globalUserInfos as JSON: {e}")
         raise SystemExit(1)
 
+    if user_infos is None:
+        print("ERROR: Could not find globalUserInfos in page HTML.")
+        with open(os.path.join(BASE_DIR, "debug_gamelist.html"), "w") as f:
+            f.write(text)
+        raise SystemExit(1)
+
     if "game_list" not in user_infos:
         print(f"ERROR: globalUserInfos does not contain 'game_list' key.")
-        print(f"Available keys: {list(user_infos.keys())}")
         raise SystemExit(1)
 
     game_list = user_infos["game_list"]
+    old_source = catalogue_source()
+    old_games = get_catalogue() if old_source is not None else None
+    old_by_id = {str(g["id"]): g for g in old_games or []}
+
+    # Games whose raw tags and player numbers are unchanged, under unchanged
+    # tag definitions, keep their resolved fields from the last pull
+    game_tags = user_infos.get("game_tags", [])
+    tags_fingerprint = fingerprint(game_tags)
+    reuse = saved_fingerprints.get("tags") == tags_fingerprint
+    fingerprints = {}
+    resolved_count = 0
 
     # Resolve tag IDs to their names using game_tags
-    tag_lookup = {t["id"]: t for t in user_infos.get("game_tags", [])}
+    tag_lookup = {t["id"]: t for t in game_tags}
     for game in game_list:
+        gid = str(game["id"])
+        fingerprints[gid] = fingerprint([game.get(f) for f in RESOLVED_FIELDS])
+        before = old_by_id.get(gid)
+        if reuse and before is not None and saved_fingerprints["games"].get(gid) == fingerprints[gid]:
+            game["tags"] = before["tags"]
+            game["min_player_number"] = before.get("min_player_number")
+            game["max_player_number"] = before.get("max_player_number")
+            continue
+        resolved_count += 1
         resolved = []
         for tag_id, value in game.get("tags", []):
             tag_info = tag_lookup.get(tag_id)
@@ -199,211 +361,615 @@ def pull_game_list():
         game["min_player_number"] = min(player_numbers) if player_numbers else None
         game["max_player_number"] = max(player_numbers) if player_numbers else None
 
-    with open(GAMES_FILE, "w") as f:
-        json.dump(game_list, f, indent=2)
+    changelog = CatalogueChangelog(CATALOGUE_CHANGELOG_FILE)
+    if old_games is None:
+        delta = None
+        changelog.append({"baseline": len(game_list)})
+    else:
+        delta = diff_catalogue(old_games, game_list)
+        print(
+            f"Catalogue changes: {len(delta['added'])} added, {len(delta['removed'])} removed, "
+            f"{len(delta['changed'])} changed ({resolved_count} games re-resolved)."
+        )
+        if any(delta.values()):
+            changelog.append(delta)
+
+    save_catalogue(game_list)
+    save_binary(CATALOGUE_FINGERPRINTS_FILE, {"page": page_digest, "tags": tags_fingerprint, "games": fingerprints})
+    _update_catalogue_indexes(game_list, old_games, old_source, delta)
 
     print(f"Done! Extracted {len(game_list)} games to {GAMES_FILE}")
+    return True
+
+
+def _update_catalogue_indexes(game_list, old_games, old_source, delta):
+    """Bring the indexes built from the catalogue up to date after a pull."""
+    source = catalogue_source()
+    # Bit positions follow catalogue order, so the bitsets are rebuilt from
+    # the already resolved list; this is one pass with no JSON parsing.
+    CatalogueIndex.build(game_list, source=source).save(CATALOGUE_INDEX_FILE)
+
+    # The neighbour lists and the name search only depend on some fields of
+    # each game, and on the set of games. If neither changed, they are kept.
+    if delta is None or delta["added"] or delta["removed"]:
+        return
+    if [g["id"] for g in old_games] != [g["id"] for g in game_list]:
+        return
+    changed_fields = {f for fields in delta["changed"].values() for f in fields}
+    for index_cls, path, fields in (
+        (NeighbourIndex, NEIGHBOUR_INDEX_FILE, FEATURE_FIELDS),
+        (GameSearchIndex, SEARCH_INDEX_FILE, NAME_FIELDS),
+    ):
+        if changed_fields & set(fields):
+            continue
+        index = index_cls.load(path, source=old_source)
+        if index is not None:
+            index.data["source"] = source
+            index.save(path)
+
+
+MIN_PAGE_SIZE = 10
+
+
+def _player_ids(players=None):
+    """Player ids to sync: ``players`` if given, else BGA_PLAYER_IDS, else BGA_PLAYER_ID."""
+    env = load_env()
+    raw = players or env.get("BGA_PLAYER_IDS") or env["BGA_PLAYER_ID"]
+    ids = []
+    for player_id in str(raw).split(","):
+        player_id = player_id.strip()
+        if player_id and player_id not in ids:
+            ids.append(player_id)
+    return ids
+
 
+def _load_sync_state():
+    if not os.path.exists(HISTORY_SYNC_FILE):
+        return {"players": {}}
+    with open(HISTORY_SYNC_FILE, "r") as f:
+        return json.load(f)
 
-def pull_player_history():
-    session, request_token = _login(BGA_EMAIL, BGA_PASSWORD)
 
-    # Load existing history
-    existing_tables = []
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r") as f:
-            existing_tables = json.load(f)
-        print(f"Loaded {len(existing_tables)} existing games from history.")
+def _save_sync_state(sync_state):
+    save_json(HISTORY_SYNC_FILE, sync_state, indent=2)
 
-    existing_ids = {t["table_id"] for t in existing_tables}
 
-    # Page through results, stopping when we hit games we already have
+def _sync_player(player_id, synced_to, store, claimed, lock):
+    """Page one player's finished games, newest first, down to ``synced_to``.
+
+    ``synced_to`` is the newest end timestamp covered by this player's last
+    sync; paging stops at the first stored table at or before it. ``None``
+    walks the player's whole history, paging with the backfill page size
+    (``BGA_MAX_PAGE_SIZE``) rather than the default ten. Tables already
+    stored, or already claimed by another player's worker in this run, are
+    skipped, so a table shared by several players is only kept once.
+
+    Returns ``(new_tables, shared, newest_end)``.
+    """
     new_tables = []
+    shared = 0
+    newest_end = synced_to if synced_to != math.inf else None
+    count = int(load_env().get("BGA_MAX_PAGE_SIZE", 100)) if synced_to is None else MIN_PAGE_SIZE
     page = 1
-    found_duplicate = False
     while True:
-        print(f"Fetching page {page}...")
-        data = _get_games(session, request_token, BGA_PLAYER_ID, page=page)
-
+        print(f"[{player_id}] Fetching page {page}...")
+        data = _logged_in_call(_get_games, player_id, page=page, count=count)
+        if page == 1 and count > MIN_PAGE_SIZE and str(data.get("status")) == "0":
+            print(f"[{player_id}]   {count} per page refused, retrying with {MIN_PAGE_SIZE}.")
+            count = MIN_PAGE_SIZE
+            continue
         tables = data.get("data", {}).get("tables", [])
         if not tables:
-            print("No more results.")
             break
 
+        reached = False
         for table in tables:
-            if table["table_id"] in existing_ids:
-                print(f"  Found existing game {table['table_id']} — stopping.")
-                found_duplicate = True
-                break
+            table_id = table["table_id"]
+            end_ts = int(table.get("end") or 0)
+            newest_end = max(newest_end or 0, end_ts)
+            if table_id in store:
+                if synced_to is not None and end_ts <= synced_to:
+                    print(f"[{player_id}]   Found existing game {table_id} — stopping.")
+                    reached = True
+                    break
+                continue
+            with lock:
+                # Pages can shift if a game finishes mid-pull, and teammates share tables
+                if table_id in claimed:
+                    shared += 1
+                    continue
+                claimed.add(table_id)
             new_tables.append(table)
 
-        if found_duplicate:
+        if reached:
             break
-
-        print(f"  Got {len(tables)} new games (total new: {len(new_tables)})")
+        if page == 1 and len(tables) < count:
+            # The endpoint capped the page size; page with what it allows
+            count = len(tables)
         page += 1
+    return new_tables, shared, newest_end
+
+
+def pull_player_history(export=False, backfill=False, players=None):
+    """Pull new finished games for every synced player into the history store.
+
+    Players are paged concurrently over one session and the scheduler's
+    shared rate budget, and their tables are merged and deduplicated by
+    ``table_id`` before being appended. If any player's sync fails, the
+    others' tables and sync progress are still saved, then the failure is
+    raised.
+    """
+    _, _, primary_id = _credentials()
+    player_ids = _player_ids(players)
+
+    store = get_history_store()
+    print(f"History store has {len(store)} existing games.")
+    sync_state = _load_sync_state()
+
+    if backfill:
+        # Players with an interrupted backfill go first so its checkpoint is resumed
+        for player_id in sorted(player_ids, key=lambda pid: _load_backfill_checkpoint(pid) is None):
+            print(f"Backfilling history for player {player_id}...")
+            newest_end = _backfill_history(player_id, store)
+            if newest_end is not None:
+                sync_state["players"][player_id] = {"synced_to": newest_end}
+                _save_sync_state(sync_state)
+        _update_forgotten_index(None)
+        if export:
+            export_history()
+        generate_stats()
+        return
+
+    if any(_load_backfill_checkpoint(pid) for pid in player_ids):
+        print("An unfinished history backfill exists; run 'history --backfill' to resume it.")
+
+    def synced_to(player_id):
+        if player_id in sync_state["players"]:
+            return sync_state["players"][player_id]["synced_to"]
+        if player_id == str(primary_id):
+            # The store has always held the primary player's history up to its newest table
+            return math.inf
+        print(f"[{player_id}] First sync for this player, fetching their whole history.")
+        return None
+
+    claimed = set()
+    lock = threading.Lock()
+
+    errors = {}
 
-    # Prepend new games (newest first) to existing history
+    def sync(player_id):
+        try:
+            return _sync_player(player_id, synced_to(player_id), store, claimed, lock)
+        except Exception as e:
+            print(f"[{player_id}] Sync failed: {e}")
+            errors[player_id] = e
+            return None
+
+    results = _get_scheduler().map(sync, player_ids)
+
+    new_tables = []
+    shared = 0
+    for player_id, result in zip(player_ids, results):
+        if result is None:
+            continue
+        tables, player_shared, newest_end = result
+        new_tables.extend(tables)
+        shared += player_shared
+        if newest_end is not None:
+            sync_state["players"][player_id] = {"synced_to": newest_end}
+        print(f"[{player_id}] {len(tables)} new games ({player_shared} shared with another player).")
+    new_tables.sort(key=lambda t: int(t.get("end") or 0), reverse=True)
+
+    # Append new games to the store; existing rows are never rewritten
     if new_tables:
-        all_tables = new_tables + existing_tables
-        with open(HISTORY_FILE, "w") as f:
-            json.dump(all_tables, f, indent=2)
-        print(f"\nDone! Added {len(new_tables)} new games. Total: {len(all_tables)}.")
-    else:
+        store.append(new_tables)
+        print(f"\nDone! Added {len(new_tables)} new games ({shared} duplicates across players skipped). Total: {len(store)}.")
+    elif not errors:
         print("\nNo new games found. History is up to date.")
+    _save_sync_state(sync_state)
+    _update_forgotten_index(new_tables)
 
-    generate_stats()
-
-
-def generate_stats():
-    with open(HISTORY_FILE, "r") as f:
-        history = json.load(f)
-
-    display_names = {}
-    if os.path.exists(GAMES_FILE):
-        with open(GAMES_FILE, "r") as f:
-            for g in json.load(f):
-                display_names[str(g["id"])] = g["display_name_en"]
-
-    def _fmt_ts(ts):
-        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%-d %b %Y") if ts else None
-
-    TRACKED_PLAYERS = {"kristiah", "thepengineer", "thomaspr", "alice2"}
-
-    # Pre-compute first-play wins: iterate oldest-first to find each player's debut per game
-    first_play_wins = {}   # player -> list of display names of games won on first play
-    first_play_seen = set()  # (player, game_name) pairs already recorded
-    for entry in reversed(history):
-        entry_players = [p.strip() for p in entry.get("player_names", "").split(",") if p.strip()]
-        entry_ranks = entry.get("ranks", "").split(",")
-        entry_game = entry.get("game_name", "")
-        entry_display = display_names.get(str(entry.get("game_id", "")), entry_game)
-        for i, player in enumerate(entry_players):
-            key = (player, entry_game)
-            if key not in first_play_seen:
-                first_play_seen.add(key)
-                try:
-                    rank = int(entry_ranks[i])
-                except (IndexError, ValueError):
-                    rank = None
-                if rank == 1:
-                    first_play_wins.setdefault(player, []).append(entry_display)
-
-    player_stats = {}  # player_name -> aggregated stats
-    game_stats = {}    # game_name -> aggregated stats
-    year_stats = {}    # year_str -> aggregated stats
-
-    for entry in history:
-        player_names = [p.strip() for p in entry.get("player_names", "").split(",") if p.strip()]
-        scores_raw = entry.get("scores", "").split(",")
-        ranks_raw = entry.get("ranks", "").split(",")
-        game_name = entry.get("game_name", "")
-        game_id = str(entry.get("game_id", ""))
-        start_ts = int(entry.get("start") or 0)
-        end_ts = int(entry.get("end") or 0)
-        duration_minutes = round((end_ts - start_ts) / 60) if end_ts > start_ts else None
-        year = datetime.fromtimestamp(end_ts, tz=timezone.utc).strftime("%Y") if end_ts else None
-
-        display = display_names.get(game_id, game_name)
-
-        # --- Per-game ---
-        if game_name not in game_stats:
-            game_stats[game_name] = {
-                "game_id": game_id,
-                "display_name": display,
-                "play_count": 0,
-                "first_played_ts": end_ts,
-                "last_played_ts": end_ts,
-                "total_duration_minutes": 0,
-                "duration_count": 0,
-                "per_player": {},
-            }
-        gs = game_stats[game_name]
-        gs["play_count"] += 1
-        if end_ts and end_ts < gs["first_played_ts"]:
+    if export:
+        export_history()
+
+    generate_stats(new_tables, history_size=len(store))
+
+    if len(errors) == 1:
+        raise next(iter(errors.values()))
+    if errors:
+        failed = ", ".join(pid for pid in player_ids if pid in errors)
+        raise Exception(f"History sync failed for players {failed}") from next(iter(errors.values()))
+
+
+def _load_backfill_checkpoint(player_id):
+    if not os.path.exists(HISTORY_BACKFILL_FILE):
+        return None
+    try:
+        with open(HISTORY_BACKFILL_FILE, "r") as f:
+            checkpoint = json.load(f)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Could not load backfill checkpoint: {e}")
+        return None
+    return checkpoint if checkpoint.get("player_id") == str(player_id) else None
+
+
+def _save_backfill_checkpoint(checkpoint):
+    save_json(HISTORY_BACKFILL_FILE, checkpoint, indent=2)
+
+
+def _backfill_history(player_id, store):
+    """Walk the player's whole history with the largest accepted page size.
+
+    Unlike the incremental pull this does not stop at the first known table:
+    unknown tables on every page are appended to the store, and a cursor is
+    checkpointed after each page so an interrupted run resumes where it
+    stopped. Runs of unknown tables between known ones are gaps left by
+    earlier interrupted syncs, and are reported once filled.
+
+    Returns the newest end timestamp seen, which marks the player as synced.
+    """
+    checkpoint = _load_backfill_checkpoint(player_id)
+    if checkpoint:
+        print(f"Resuming backfill at offset {checkpoint['offset']} (page size {checkpoint['count']}).")
+    else:
+        checkpoint = {
+            "player_id": str(player_id),
+            "count": int(load_env().get("BGA_MAX_PAGE_SIZE", 100)),
+            "offset": 0,
+            "added": 0,
+            "seen_known": False,  # passed a table already in the store
+            "open_gap": None,     # unknown tables seen since the last known one
+            "gaps": [],
+            "newest_end": None,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    while True:
+        count, offset = checkpoint["count"], checkpoint["offset"]
+        page = offset // count + 1
+        print(f"Fetching page {page} ({count} per page)...")
+        try:
+            data = _logged_in_call(_get_games, player_id, page=page, count=count)
+        except ValueError:
+            data = None
+        if data is None or str(data.get("status")) == "0":
+            if count <= MIN_PAGE_SIZE:
+                raise Exception(f"History request failed at offset {offset}: {data}")
+            # Shrink the page and move the cursor back to a page boundary; the
+            # rows between it and the old cursor were already handled
+            smaller = max(MIN_PAGE_SIZE, count // 2)
+            checkpoint["count"] = smaller
+            checkpoint["offset"] = offset // smaller * smaller
+            checkpoint["skip"] = checkpoint.get("skip", 0) + offset - checkpoint["offset"]
+            print(f"  Request rejected, retrying with {smaller} per page.")
+            _save_backfill_checkpoint(checkpoint)
+            continue
+
+        tables = data.get("data", {}).get("tables", [])
+        page_size, skip = len(tables), checkpoint.get("skip", 0)
+        if page_size <= skip:
+            break
+        tables = tables[skip:]
+        checkpoint["skip"] = 0
+
+        new_tables = []
+        checkpoint["newest_end"] = max(checkpoint["newest_end"] or 0, *(int(t.get("end") or 0) for t in tables))
+        for table in tables:
+            if table["table_id"] in store:
+                gap = checkpoint["open_gap"]
+                if gap and checkpoint["seen_known"]:
+                    checkpoint["gaps"].append(gap)
+                    print(f"  Filled gap of {gap['tables']} games ending {_fmt_ts(gap['oldest_end'])} – {_fmt_ts(gap['newest_end'])}.")
+                checkpoint["open_gap"] = None
+                checkpoint["seen_known"] = True
+                continue
+            new_tables.append(table)
+            end_ts = int(table.get("end") or 0)
+            gap = checkpoint["open_gap"] or {"newest_end": end_ts, "tables": 0}
+            gap["oldest_end"] = end_ts
+            gap["tables"] += 1
+            checkpoint["open_gap"] = gap
+
+        added = store.append(new_tables)
+        checkpoint["added"] += added
+        print(f"  {added} new of {len(tables)} (total new: {checkpoint['added']})")
+
+        if offset == 0 and page_size < count:
+            # The endpoint capped the page size; page with what it allows
+            checkpoint["count"] = page_size
+            checkpoint["offset"] = page_size
+        else:
+            checkpoint["offset"] = offset + count
+        _save_backfill_checkpoint(checkpoint)
+
+    if os.path.exists(HISTORY_BACKFILL_FILE):
+        os.remove(HISTORY_BACKFILL_FILE)
+    gaps = checkpoint["gaps"]
+    print(f"\nBackfill complete. Added {checkpoint['added']} games, filled {len(gaps)} gap(s). Total: {len(store)}.")
+    return checkpoint["newest_end"]
+
+
+def export_history():
+    """Write the history store to bga_history.json in its original newest-first shape."""
+    count = get_history_store().export_json(HISTORY_FILE)
+    print(f"Exported {count} games to {HISTORY_FILE}")
+
+
+TRACKED_PLAYERS = {"kristiah", "thepengineer", "thomaspr", "alice2"}
+STATS_STATE_VERSION = 3
+# Tables per chunk when a full rebuild streams the history through NumPy
+STATS_CHUNK_TABLES = 20000
+
+
+def _fmt_ts(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%-d %b %Y") if ts else None
+
+
+def _new_stats_state():
+    return {
+        "version": STATS_STATE_VERSION,
+        "seq": 0,               # number of tables folded so far, oldest first
+        "total_games": 0,
+        "min_end": None,
+        "max_end": None,
+        "tracked": set(TRACKED_PLAYERS),  # the only players aggregated per player
+        "players": {},          # player_name -> aggregated stats
+        "games": {},            # game_name -> aggregated stats
+        "years": {},            # year_str -> aggregated stats
+        "first_plays": {},      # (player, game_name) -> [end_ts, seq, won, game_id] of the earliest play
+        "rivals": {},           # (player_a, player_b, game_name), a < b -> [*RIVALRY_COUNTS from a's side, game_id]
+    }
+
+
+def _load_stats_state():
+    with bga_profile.phase("load stats_state.bin", category="storage"):
+        state = load_binary(STATS_STATE_FILE)
+    if state is None or state.get("version") != STATS_STATE_VERSION or state["tracked"] != TRACKED_PLAYERS:
+        return None
+    return state
+
+
+def _save_stats_state(state):
+    with bga_profile.phase("dump stats_state.bin", category="storage"):
+        save_binary(STATS_STATE_FILE, state)
+
+
+def _table_players(entry):
+    """``(position, player, rank or None)`` for each named player of a history entry."""
+    player_names = [p.strip() for p in entry.get("player_names", "").split(",") if p.strip()]
+    ranks_raw = entry.get("ranks", "").split(",")
+    for i, player in enumerate(player_names):
+        try:
+            rank = int(ranks_raw[i])
+        except (IndexError, ValueError):
+            rank = None
+        yield i, player, rank
+
+
+def _table_scores(entry):
+    """Each named player's score, as an int or None, in ``player_names`` order."""
+    scores = []
+    for score in entry.get("scores", "").split(","):
+        try:
+            scores.append(int(score))
+        except ValueError:
+            scores.append(None)
+    return scores
+
+
+# Head-to-head counts kept per (player_a, player_b, game): tables shared,
+# a placed ahead / behind / level, and the summed place gap (b's rank minus
+# a's) over tables both were ranked at, and the summed score margin over
+# tables both had a score at.
+RIVALRY_COUNTS = ("tables", "wins", "losses", "ties", "place_gap", "score_margin", "scored")
+
+
+def _rivalry_counts(rank_a, score_a, rank_b, score_b):
+    """``RIVALRY_COUNTS`` from a's side for one table a and b both played."""
+    ranked = rank_a is not None and rank_b is not None
+    scored = score_a is not None and score_b is not None
+    return (
+        1,
+        int(ranked and rank_a < rank_b),
+        int(ranked and rank_a > rank_b),
+        int(ranked and rank_a == rank_b),
+        rank_b - rank_a if ranked else 0,
+        score_a - score_b if scored else 0,
+        int(scored),
+    )
+
+
+def _flip_rivalry(counts):
+    tables, wins, losses, ties, place_gap, score_margin, scored = counts
+    return (tables, losses, wins, ties, -place_gap, -score_margin, scored)
+
+
+def _rivalry_summary(counts):
+    tables, wins, losses, ties, place_gap, score_margin, scored = counts
+    ranked = wins + losses + ties
+    return {
+        "tables": tables,
+        "wins": wins,
+        "losses": losses,
+        "ties": ties,
+        "win_rate": round(wins / ranked, 3) if ranked else None,
+        "avg_place_gap": round(place_gap / ranked, 2) if ranked else None,
+        "avg_score_margin": round(score_margin / scored, 1) if scored else None,
+    }
+
+
+def _add_rivalry(state, a, b, game_name, game_id, counts):
+    """Add ``counts`` (from a's side) to the record for a and b at ``game_name``."""
+    if a > b:
+        a, b, counts = b, a, _flip_rivalry(counts)
+    record = state["rivals"].setdefault((a, b, game_name), [0] * len(RIVALRY_COUNTS) + [game_id])
+    for k, value in enumerate(counts):
+        record[k] += value
+    record[-1] = game_id
+
+
+def _fold_stats_entry(state, entry):
+    """Fold one history entry into the raw aggregates.
+
+    Entries must be folded oldest first. Every aggregate remembers the
+    (seq, player index) it was last touched at, so the output can be ordered
+    exactly as a newest-first scan of the history would have inserted it.
+    Per-player aggregates are only kept for tracked players.
+    """
+    state["seq"] += 1
+    seq = state["seq"]
+    state["total_games"] += 1
+
+    game_name = entry.get("game_name", "")
+    game_id = str(entry.get("game_id", ""))
+    start_ts = int(entry.get("start") or 0)
+    end_ts = int(entry.get("end") or 0)
+    duration_minutes = round((end_ts - start_ts) / 60) if end_ts > start_ts else None
+    year = datetime.fromtimestamp(end_ts, tz=timezone.utc).strftime("%Y") if end_ts else None
+
+    if end_ts:
+        state["min_end"] = end_ts if state["min_end"] is None else min(state["min_end"], end_ts)
+        state["max_end"] = end_ts if state["max_end"] is None else max(state["max_end"], end_ts)
+
+    # --- Per-game ---
+    if game_name not in state["games"]:
+        state["games"][game_name] = {
+            "play_count": 0,
+            "first_played_ts": None,
+            "last_played_ts": None,
+            "total_duration_minutes": 0,
+            "duration_count": 0,
+            "per_player": {},
+        }
+    gs = state["games"][game_name]
+    gs["game_id"] = game_id
+    gs["last_seen"] = [seq, 0]
+    gs["play_count"] += 1
+    if end_ts:
+        if gs["first_played_ts"] is None or end_ts < gs["first_played_ts"]:
             gs["first_played_ts"] = end_ts
-        if end_ts and end_ts > gs["last_played_ts"]:
+        if gs["last_played_ts"] is None or end_ts > gs["last_played_ts"]:
             gs["last_played_ts"] = end_ts
-        if duration_minutes is not None:
-            gs["total_duration_minutes"] += duration_minutes
-            gs["duration_count"] += 1
-
-        # --- Per-year ---
+    if duration_minutes is not None:
+        gs["total_duration_minutes"] += duration_minutes
+        gs["duration_count"] += 1
+
+    # --- Per-year ---
+    if year:
+        if year not in state["years"]:
+            state["years"][year] = {
+                "total_games": 0,
+                "per_player": {},
+                "per_game": {},
+            }
+        ys = state["years"][year]
+        ys["total_games"] += 1
+        if game_name not in ys["per_game"]:
+            ys["per_game"][game_name] = {"play_count": 0}
+        yg = ys["per_game"][game_name]
+        yg["game_id"] = game_id
+        yg["last_seen"] = [seq, 0]
+        yg["play_count"] += 1
+
+    tracked = state["tracked"]
+    scores = _table_scores(entry)
+    seated = []  # (player, rank, score) of each tracked player, for head-to-head
+    for i, player, rank in _table_players(entry):
+        if player not in tracked:
+            continue
+        seated.append((player, rank, scores[i] if i < len(scores) else None))
+
+        # --- First-play wins: each (player, game)'s earliest play ---
+        key = (player, game_name)
+        first = state["first_plays"].get(key)
+        if first is None or (end_ts, seq) < (first[0], first[1]):
+            state["first_plays"][key] = [end_ts, seq, rank == 1, game_id]
+
+        # --- Global per-player ---
+        if player not in state["players"]:
+            state["players"][player] = {
+                "games_played": 0,
+                "wins": 0,
+                "rank_sum": 0,
+                "rank_count": 0,
+                "per_game": {},
+            }
+        ps = state["players"][player]
+        ps["last_seen"] = [seq, i]
+        ps["games_played"] += 1
+        if rank == 1:
+            ps["wins"] += 1
+        if rank is not None:
+            ps["rank_sum"] += rank
+            ps["rank_count"] += 1
+
+        if game_name not in ps["per_game"]:
+            ps["per_game"][game_name] = {"plays": 0, "wins": 0}
+        pg = ps["per_game"][game_name]
+        pg["game_id"] = game_id
+        pg["last_seen"] = [seq, i]
+        pg["plays"] += 1
+        if rank == 1:
+            pg["wins"] += 1
+
+        # --- Per-game per-player ---
+        if player not in gs["per_player"]:
+            gs["per_player"][player] = {"plays": 0, "wins": 0}
+        gp = gs["per_player"][player]
+        gp["last_seen"] = [seq, i]
+        gp["plays"] += 1
+        if rank == 1:
+            gp["wins"] += 1
+
+        # --- Per-year per-player ---
         if year:
-            if year not in year_stats:
-                year_stats[year] = {
-                    "total_games": 0,
-                    "per_player": {},
-                    "per_game": {},
-                }
-            ys = year_stats[year]
-            ys["total_games"] += 1
-            if game_name not in ys["per_game"]:
-                ys["per_game"][game_name] = {"display_name": display, "play_count": 0}
-            ys["per_game"][game_name]["play_count"] += 1
-
-        for i, player in enumerate(player_names):
-            try:
-                rank = int(ranks_raw[i])
-            except (IndexError, ValueError):
-                rank = None
-
-            # --- Global per-player ---
-            if player not in player_stats:
-                player_stats[player] = {
+            if player not in ys["per_player"]:
+                ys["per_player"][player] = {
                     "games_played": 0,
                     "wins": 0,
                     "rank_sum": 0,
                     "rank_count": 0,
-                    "per_game": {},
                 }
-            ps = player_stats[player]
-            ps["games_played"] += 1
+            yp = ys["per_player"][player]
+            yp["last_seen"] = [seq, i]
+            yp["games_played"] += 1
             if rank == 1:
-                ps["wins"] += 1
+                yp["wins"] += 1
             if rank is not None:
-                ps["rank_sum"] += rank
-                ps["rank_count"] += 1
+                yp["rank_sum"] += rank
+                yp["rank_count"] += 1
 
-            if game_name not in ps["per_game"]:
-                ps["per_game"][game_name] = {"display_name": display, "plays": 0, "wins": 0}
-            ps["per_game"][game_name]["plays"] += 1
-            if rank == 1:
-                ps["per_game"][game_name]["wins"] += 1
+    # --- Head-to-head: each pair of tracked players at the table ---
+    for x, (a, rank_a, score_a) in enumerate(seated):
+        for b, rank_b, score_b in seated[x + 1:]:
+            if a != b:
+                _add_rivalry(state, a, b, game_name, game_id, _rivalry_counts(rank_a, score_a, rank_b, score_b))
+
+
+def _by_recency(aggregates):
+    """Items of an aggregate dict, most recently played first."""
+    return sorted(aggregates.items(), key=lambda kv: (-kv[1]["last_seen"][0], kv[1]["last_seen"][1]))
 
-            # --- Per-game per-player ---
-            if player not in gs["per_player"]:
-                gs["per_player"][player] = {"plays": 0, "wins": 0}
-            gs["per_player"][player]["plays"] += 1
-            if rank == 1:
-                gs["per_player"][player]["wins"] += 1
-
-            # --- Per-year per-player ---
-            if year:
-                if player not in ys["per_player"]:
-                    ys["per_player"][player] = {
-                        "games_played": 0,
-                        "wins": 0,
-                        "rank_sum": 0,
-                        "rank_count": 0,
-                    }
-                yp = ys["per_player"][player]
-                yp["games_played"] += 1
-                if rank == 1:
-                    yp["wins"] += 1
-                if rank is not None:
-                    yp["rank_sum"] += rank
-                    yp["rank_count"] += 1
+
+@profiled("stats.build", hotspots=True)
+def _build_stats(state, display_names):
+    def _display(agg, name):
+        return display_names.get(agg["game_id"], name)
+
+    first_play_wins = {}
+    for (player, gname), (_, _, won, gid) in state["first_plays"].items():
+        if won:
+            first_play_wins.setdefault(player, []).append(display_names.get(gid, gname))
 
     # --- Build output: per_player ---
     out_players = {}
-    for player, ps in player_stats.items():
+    for player, ps in _by_recency(state["players"]):
         if player not in TRACKED_PLAYERS:
             continue
         per_game_out = {}
-        for gname, pg in ps["per_game"].items():
+        for gname, pg in _by_recency(ps["per_game"]):
             per_game_out[gname] = {
-                "display_name": pg["display_name"],
+                "display_name": _display(pg, gname),
                 "plays": pg["plays"],
                 "wins": pg["wins"],
                 "win_rate": round(pg["wins"] / pg["plays"], 3),
@@ -412,6 +978,7 @@ def generate_stats():
         eligible = [g for g in per_game_out if per_game_out[g]["plays"] >= 3]
         best_win_rate = max(eligible, key=lambda g: per_game_out[g]["win_rate"]) if eligible else None
         best_weighted = max(per_game_out, key=lambda g: per_game_out[g]["wins"] / (per_game_out[g]["plays"] + 3)) if per_game_out else None
+        first_wins = first_play_wins.get(player, [])
         out_players[player] = {
             "games_played": ps["games_played"],
             "wins": ps["wins"],
@@ -420,14 +987,14 @@ def generate_stats():
             "most_played_game": most_played,
             "best_win_rate_game": best_win_rate,
             "best_weighted_win_rate_game": best_weighted,
-            "first_play_wins": len(first_play_wins.get(player, [])),
-            "first_play_win_games": sorted(first_play_wins.get(player, [])),
+            "first_play_wins": len(first_wins),
+            "first_play_win_games": sorted(first_wins),
             "per_game": per_game_out,
         }
 
     # --- Build output: per_game ---
     out_games = {}
-    for gname, gs in game_stats.items():
+    for gname, gs in _by_recency(state["games"]):
         avg_duration = round(gs["total_duration_minutes"] / gs["duration_count"]) if gs["duration_count"] else None
         per_player_out = {
             player: {
@@ -435,10 +1002,10 @@ def generate_stats():
                 "wins": pp["wins"],
                 "win_rate": round(pp["wins"] / pp["plays"], 3),
             }
-            for player, pp in gs["per_player"].items()
+            for player, pp in _by_recency(gs["per_player"])
             if player in TRACKED_PLAYERS
         }
-        out_games[gs["display_name"]] = {
+        out_games[_display(gs, gname)] = {
             "game_id": gs["game_id"],
             "play_count": gs["play_count"],
             "first_played": _fmt_ts(gs["first_played_ts"]),
@@ -449,10 +1016,11 @@ def generate_stats():
 
     # --- Build output: per_year ---
     out_years = {}
-    for year, ys in sorted(year_stats.items()):
-        most_played_game = max(ys["per_game"], key=lambda g: ys["per_game"][g]["play_count"]) if ys["per_game"] else None
+    for year, ys in sorted(state["years"].items()):
+        year_games = _by_recency(ys["per_game"])
+        most_played_game = max(year_games, key=lambda kv: kv[1]["play_count"]) if year_games else None
         per_player_out = {}
-        for player, yp in ys["per_player"].items():
+        for player, yp in _by_recency(ys["per_player"]):
             if player not in TRACKED_PLAYERS:
                 continue
             per_player_out[player] = {
@@ -462,37 +1030,437 @@ def generate_stats():
                 "avg_rank": round(yp["rank_sum"] / yp["rank_count"], 2) if yp["rank_count"] else None,
             }
         per_game_out = {
-            gd["display_name"]: gd["play_count"]
-            for gname, gd in sorted(ys["per_game"].items(), key=lambda x: -x[1]["play_count"])
+            _display(gd, gname): gd["play_count"]
+            for gname, gd in sorted(year_games, key=lambda x: -x[1]["play_count"])
         }
         out_years[year] = {
             "total_games": ys["total_games"],
-            "most_played_game": ys["per_game"][most_played_game]["display_name"] if most_played_game else None,
+            "most_played_game": _display(most_played_game[1], most_played_game[0]) if most_played_game else None,
             "per_player": per_player_out,
             "per_game": per_game_out,
         }
 
-    all_end_ts = [int(e.get("end") or 0) for e in history if e.get("end")]
-    stats = {
+    # --- Build output: head_to_head, both directions of each pair ---
+    rivalries = {}  # (player, opponent) -> {game_name: (counts from player's side, game_id)}
+    for (a, b, gname), record in state["rivals"].items():
+        counts, gid = tuple(record[:-1]), record[-1]
+        rivalries.setdefault((a, b), {})[gname] = (counts, gid)
+        rivalries.setdefault((b, a), {})[gname] = (_flip_rivalry(counts), gid)
+    out_head_to_head = {}
+    for (player, opponent), per_game in sorted(rivalries.items()):
+        total = [sum(counts[k] for counts, _ in per_game.values()) for k in range(len(RIVALRY_COUNTS))]
+        per_game_out = {
+            gname: {"display_name": display_names.get(gid, gname), **_rivalry_summary(counts)}
+            for gname, (counts, gid) in sorted(per_game.items(), key=lambda kv: (-kv[1][0][0], kv[0]))
+        }
+        out_head_to_head.setdefault(player, {})[opponent] = {**_rivalry_summary(total), "per_game": per_game_out}
+
+    return {
         "generated_at": datetime.now(timezone.utc).strftime("%-d %b %Y %H:%M UTC"),
-        "total_games": len(history),
+        "total_games": state["total_games"],
         "date_range": {
-            "first": _fmt_ts(min(all_end_ts)) if all_end_ts else None,
-            "last": _fmt_ts(max(all_end_ts)) if all_end_ts else None,
+            "first": _fmt_ts(state["min_end"]),
+            "last": _fmt_ts(state["max_end"]),
         },
         "per_player": out_players,
         "per_game": out_games,
         "per_year": out_years,
+        "head_to_head": out_head_to_head,
     }
 
-    with open(STATS_FILE, "w") as f:
-        json.dump(stats, f, indent=2)
+
+def _merge_columns(state, cols):
+    """Merge the next chunk of the history, as columns, into the raw aggregates.
+
+    ``cols`` is a ``HistoryColumns`` of the tables that follow those already
+    folded into ``state``, oldest first, with rows for tracked players only;
+    table ``t`` gets seq ``state["seq"] + t + 1``. Each aggregate is a
+    group-by over the chunk's table rows or (table, player) rows, added to
+    what earlier chunks left. Its ``last_seen`` comes from the last row in
+    its group, which is newer than anything already merged.
+    """
+    from bga_columns import GroupBy, np
+
+    seq0 = state["seq"]
+    state["seq"] += len(cols)
+    state["total_games"] += len(cols)
+    if not len(cols):
+        return
+    dated = cols.end > 0
+    if dated.any():
+        lo, hi = int(cols.end[dated].min()), int(cols.end[dated].max())
+        state["min_end"] = lo if state["min_end"] is None else min(state["min_end"], lo)
+        state["max_end"] = hi if state["max_end"] is None else max(state["max_end"], hi)
+
+    n_games, n_players = len(cols.game_names), len(cols.players)
+    tables = np.arange(len(cols))
+    has_duration = cols.duration >= 0
+    row_game = cols.game[cols.table]
+    row_year = cols.year[cols.table]
+    rows = np.arange(len(cols.table))
+    win = cols.has_rank & (cols.rank == 1)
+
+    # --- Per-game ---
+    by_game = GroupBy(cols.game)
+    counts = by_game.count()
+    last = by_game.last(tables)
+    first_ts, last_ts = by_game.min(cols.end, dated), by_game.max(cols.end, dated)
+    dated_count = by_game.count(dated)
+    duration_sum, duration_count = by_game.sum(cols.duration, has_duration), by_game.count(has_duration)
+    for k, g in enumerate(by_game.keys):
+        gs = state["games"].setdefault(cols.game_names[g], {
+            "play_count": 0,
+            "first_played_ts": None,
+            "last_played_ts": None,
+            "total_duration_minutes": 0,
+            "duration_count": 0,
+            "per_player": {},
+        })
+        gs["play_count"] += int(counts[k])
+        if dated_count[k]:
+            first, latest = int(first_ts[k]), int(last_ts[k])
+            gs["first_played_ts"] = first if gs["first_played_ts"] is None else min(gs["first_played_ts"], first)
+            gs["last_played_ts"] = latest if gs["last_played_ts"] is None else max(gs["last_played_ts"], latest)
+        gs["total_duration_minutes"] += int(duration_sum[k])
+        gs["duration_count"] += int(duration_count[k])
+        gs["game_id"] = cols.game_ids[cols.game_id[last[k]]]
+        gs["last_seen"] = [seq0 + int(last[k]) + 1, 0]
+
+    # --- Per-year ---
+    has_year = cols.year >= 0
+    years = {}
+    by_year = GroupBy(cols.year[has_year])
+    for year, total in zip(by_year.keys, by_year.count()):
+        ys = state["years"].setdefault(str(year), {"total_games": 0, "per_player": {}, "per_game": {}})
+        ys["total_games"] += int(total)
+        years[int(year)] = ys
+    by_year_game = GroupBy(cols.year[has_year] * n_games + cols.game[has_year])
+    counts = by_year_game.count()
+    last = tables[has_year][by_year_game.last(np.arange(int(has_year.sum())))]
+    for k, key in enumerate(by_year_game.keys):
+        year, g = divmod(int(key), n_games)
+        yg = years[year]["per_game"].setdefault(cols.game_names[g], {"play_count": 0})
+        yg["play_count"] += int(counts[k])
+        yg["game_id"] = cols.game_ids[cols.game_id[last[k]]]
+        yg["last_seen"] = [seq0 + int(last[k]) + 1, 0]
+
+    def last_seen(row):
+        return [seq0 + int(cols.table[row]) + 1, int(cols.pos[row])]
+
+    # --- Global per-player ---
+    by_player = GroupBy(cols.player)
+    played, wins = by_player.count(), by_player.count(win)
+    rank_sum, rank_count = by_player.sum(cols.rank, cols.has_rank), by_player.count(cols.has_rank)
+    last = by_player.last(rows)
+    for k, p in enumerate(by_player.keys):
+        ps = state["players"].setdefault(cols.players[p], {
+            "games_played": 0,
+            "wins": 0,
+            "rank_sum": 0,
+            "rank_count": 0,
+            "per_game": {},
+        })
+        ps["games_played"] += int(played[k])
+        ps["wins"] += int(wins[k])
+        ps["rank_sum"] += int(rank_sum[k])
+        ps["rank_count"] += int(rank_count[k])
+        ps["last_seen"] = last_seen(last[k])
+
+    # --- Per-player per-game, and per-game per-player ---
+    player_game = cols.player * n_games + row_game
+    by_player_game = GroupBy(player_game)
+    plays, wins, last = by_player_game.count(), by_player_game.count(win), by_player_game.last(rows)
+    for k, key in enumerate(by_player_game.keys):
+        p, g = divmod(int(key), n_games)
+        player, game_name = cols.players[p], cols.game_names[g]
+        pg = state["players"][player]["per_game"].setdefault(game_name, {"plays": 0, "wins": 0})
+        pg["plays"] += int(plays[k])
+        pg["wins"] += int(wins[k])
+        pg["game_id"] = cols.game_ids[cols.game_id[cols.table[last[k]]]]
+        pg["last_seen"] = last_seen(last[k])
+        gp = state["games"][game_name]["per_player"].setdefault(player, {"plays": 0, "wins": 0})
+        gp["plays"] += int(plays[k])
+        gp["wins"] += int(wins[k])
+        gp["last_seen"] = last_seen(last[k])
+
+    # --- Per-year per-player ---
+    row_has_year = row_year >= 0
+    by_year_player = GroupBy(row_year[row_has_year] * n_players + cols.player[row_has_year])
+    has_rank = cols.has_rank[row_has_year]
+    played, wins = by_year_player.count(), by_year_player.count(win[row_has_year])
+    rank_sum = by_year_player.sum(cols.rank[row_has_year], has_rank)
+    rank_count = by_year_player.count(has_rank)
+    last = rows[row_has_year][by_year_player.last(np.arange(int(row_has_year.sum())))]
+    for k, key in enumerate(by_year_player.keys):
+        year, p = divmod(int(key), n_players)
+        yp = years[year]["per_player"].setdefault(cols.players[p], {
+            "games_played": 0,
+            "wins": 0,
+            "rank_sum": 0,
+            "rank_count": 0,
+        })
+        yp["games_played"] += int(played[k])
+        yp["wins"] += int(wins[k])
+        yp["rank_sum"] += int(rank_sum[k])
+        yp["rank_count"] += int(rank_count[k])
+        yp["last_seen"] = last_seen(last[k])
+
+    # --- First-play wins: each (player, game)'s earliest row ---
+    # Chunks arrive oldest first, so a pair seen in an earlier chunk keeps its play
+    keys, first = np.unique(player_game, return_index=True)
+    for key, row in zip(keys, first):
+        p, g = divmod(int(key), n_games)
+        pair = (cols.players[p], cols.game_names[g])
+        if pair not in state["first_plays"]:
+            table = cols.table[row]
+            state["first_plays"][pair] = [
+                int(cols.end[table]), seq0 + int(table) + 1, bool(win[row]), cols.game_ids[cols.game_id[table]],
+            ]
+
+    # --- Head-to-head: every pair of rows at the same table ---
+    # Rows are sorted by table, so pairs d rows apart run out at the first d with none
+    left, right = [], []
+    for d in range(1, len(rows)):
+        same = cols.table[:-d] == cols.table[d:]
+        if not same.any():
+            break
+        left.append(rows[:-d][same])
+        right.append(rows[d:][same])
+    if not left:
+        return
+    i, j = np.concatenate(left), np.concatenate(right)
+    # Orient each pair by player name, as the state keys are
+    name_order = np.empty(n_players, dtype=np.int64)
+    name_order[np.argsort(cols.players)] = np.arange(n_players)
+    swap = name_order[cols.player[i]] > name_order[cols.player[j]]
+    i, j = np.where(swap, j, i), np.where(swap, i, j)
+    distinct = cols.player[i] != cols.player[j]
+    i, j = i[distinct], j[distinct]
+    ranked = cols.has_rank[i] & cols.has_rank[j]
+    scored = cols.has_score[i] & cols.has_score[j]
+    by_pair = GroupBy((cols.player[i] * n_players + cols.player[j]) * n_games + row_game[i])
+    columns = (
+        by_pair.count(),
+        by_pair.count(ranked & (cols.rank[i] < cols.rank[j])),
+        by_pair.count(ranked & (cols.rank[i] > cols.rank[j])),
+        by_pair.count(ranked & (cols.rank[i] == cols.rank[j])),
+        by_pair.sum(cols.rank[j] - cols.rank[i], ranked),
+        by_pair.sum(cols.score[i] - cols.score[j], scored),
+        by_pair.count(scored),
+    )
+    last = by_pair.last(cols.table[i])
+    for k, key in enumerate(by_pair.keys):
+        pair, g = divmod(int(key), n_games)
+        a, b = divmod(pair, n_players)
+        _add_rivalry(
+            state, cols.players[a], cols.players[b], cols.game_names[g],
+            cols.game_ids[cols.game_id[last[k]]], tuple(int(column[k]) for column in columns),
+        )
+
+
+@profiled("stats.rebuild", hotspots=True)
+def _rebuild_stats_state(vectorized=True):
+    """Raw aggregates for the full history, streamed from the store oldest first.
+
+    With NumPy, each chunk of ``STATS_CHUNK_TABLES`` tables is parsed into
+    columns and merged with group-bys; without it, tables are folded one at a
+    time. Either way only one chunk of the history is in memory at once.
+    """
+    import bga_columns
+
+    tables = get_history_store().iter_tables(newest_first=False)
+    state = _new_stats_state()
+    if vectorized and bga_columns.available():
+        while True:
+            cols = bga_columns.HistoryColumns.from_tables(islice(tables, STATS_CHUNK_TABLES), players=state["tracked"])
+            if not len(cols):
+                return state
+            _merge_columns(state, cols)
+    for entry in tables:
+        _fold_stats_entry(state, entry)
+    return state
+
+
+@profiled("stats")
+def generate_stats(new_tables=None, history_size=None):
+    """Write bga_stats.json.
+
+    With ``new_tables`` (newest first, as returned by the pull) only those
+    tables are folded into the saved aggregates. Without it, or when the saved
+    aggregates do not line up with a history of ``history_size`` tables, the
+    aggregates are rebuilt from the full history.
+    """
+    state = None
+    if new_tables is not None:
+        state = _load_stats_state()
+        if state and history_size is not None and state["total_games"] + len(new_tables) != history_size:
+            print("Saved stats state is out of step with history, rebuilding.")
+            state = None
+        elif state and state["max_end"] and any(int(t.get("end") or 0) < state["max_end"] for t in new_tables):
+            # Older tables change first-play and ordering results; fold from scratch
+            state = None
+        if state:
+            with bga_profile.phase("stats.fold", hotspots=True):
+                for entry in reversed(new_tables):
+                    _fold_stats_entry(state, entry)
+    if state is None:
+        state = _rebuild_stats_state()
+    _save_stats_state(state)
+    _update_range_index(new_tables, state["total_games"])
+
+    stats = _build_stats(state, get_display_names())
+
+    save_stats(stats)
     print(f"Stats written to {STATS_FILE}")
     return stats
 
 
+def _index_range_entry(index, entry):
+    start_ts = int(entry.get("start") or 0)
+    end_ts = int(entry.get("end") or 0)
+    duration_minutes = round((end_ts - start_ts) / 60) if end_ts > start_ts else None
+    players = [(player, rank) for _, player, rank in _table_players(entry)]
+    return index.add(end_ts, str(entry.get("game_id", "")), entry.get("game_name", ""), duration_minutes, players)
+
+
+@profiled("stats.ranges", hotspots=True)
+def _rebuild_range_index():
+    index = RangeIndex()
+    for entry in get_history_store().iter_tables(newest_first=False):
+        _index_range_entry(index, entry)
+    return index
+
+
+def _load_range_index():
+    index = RangeIndex.load(STATS_RANGES_FILE)
+    if index is None or index.total_games != len(get_history_store()):
+        index = _rebuild_range_index()
+        index.save(STATS_RANGES_FILE)
+    return index
+
+
+def get_range_index():
+    """The date-range index, built on first use and kept up to date by ``generate_stats``."""
+    return memoized("stats_ranges", STATS_RANGES_FILE, _load_range_index)
+
+
+def _update_range_index(new_tables, total_games):
+    # Extend an existing index with the new tables, or drop it to be rebuilt on the next query
+    index = RangeIndex.load(STATS_RANGES_FILE)
+    if index is None:
+        return
+    if new_tables:
+        if all(_index_range_entry(index, t) for t in reversed(new_tables)) and index.total_games == total_games:
+            index.save(STATS_RANGES_FILE)
+            return
+    elif index.total_games == total_games:
+        return
+    os.remove(STATS_RANGES_FILE)
+
+
+class InvalidDate(ValueError):
+    """A --from/--to date that is neither YYYY-MM-DD nor <n>d."""
+
+
+def _parse_date(value, end_of_day=False):
+    """``YYYY-MM-DD`` (UTC), or ``<n>d`` for n days ago, as a timestamp."""
+    if value.endswith("d") and value[:-1].isdigit():
+        return int((datetime.now(timezone.utc) - timedelta(days=int(value[:-1]))).timestamp())
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise InvalidDate(f"Invalid date '{value}': expected YYYY-MM-DD, or e.g. 90d for 90 days ago") from None
+    if end_of_day:
+        day += timedelta(days=1, seconds=-1)
+    return int(day.timestamp())
+
+
+@profiled("stats.range")
+def stats_between(date_from=None, date_to=None):
+    """Per-player and per-game stats for games that ended between two dates.
+
+    Each total is read off the range index's prefix sums with two bisections,
+    so no history is scanned. Raises ``InvalidDate`` for a malformed date.
+    """
+    start_ts = _parse_date(date_from) if date_from else 0
+    end_ts = _parse_date(date_to, end_of_day=True) if date_to else int(time.time())
+    raw = get_range_index().query(start_ts, end_ts)
+    display_names = get_display_names()
+
+    def _display(gname):
+        return display_names.get(raw["games"][gname]["game_id"], gname)
+
+    def _per_player(per_player):
+        return {
+            player: {"plays": pp["plays"], "wins": pp["wins"], "win_rate": round(pp["wins"] / pp["plays"], 3)}
+            for player, pp in sorted(per_player.items(), key=lambda kv: -kv[1]["plays"])
+            if player in TRACKED_PLAYERS
+        }
+
+    out_players = {}
+    for player, ps in sorted(raw["players"].items(), key=lambda kv: -kv[1]["games_played"]):
+        if player not in TRACKED_PLAYERS:
+            continue
+        per_game_out = {
+            gname: {
+                "display_name": _display(gname),
+                "plays": pg["plays"],
+                "wins": pg["wins"],
+                "win_rate": round(pg["wins"] / pg["plays"], 3),
+            }
+            for gname, pg in sorted(ps["per_game"].items(), key=lambda kv: -kv[1]["plays"])
+        }
+        out_players[player] = {
+            "games_played": ps["games_played"],
+            "wins": ps["wins"],
+            "win_rate": round(ps["wins"] / ps["games_played"], 3),
+            "avg_rank": round(ps["rank_sum"] / ps["rank_count"], 2) if ps["rank_count"] else None,
+            "most_played_game": next(iter(per_game_out), None),
+            "per_game": per_game_out,
+        }
+
+    out_games = {}
+    for gname, gs in sorted(raw["games"].items(), key=lambda kv: -kv[1]["play_count"]):
+        out_games[_display(gname)] = {
+            "game_id": gs["game_id"],
+            "play_count": gs["play_count"],
+            "avg_duration_minutes": round(gs["duration_sum"] / gs["duration_count"]) if gs["duration_count"] else None,
+            "per_player": _per_player(gs["per_player"]),
+        }
+
+    return {
+        "from": _fmt_ts(start_ts) if start_ts else None,
+        "to": _fmt_ts(end_ts),
+        "total_games": raw["total_games"],
+        "per_player": out_players,
+        "per_game": out_games,
+    }
+
+
+def check_stats_consistency():
+    """Compare stats from the saved incremental aggregates against a full rebuild."""
+    state = _load_stats_state()
+    if state is None:
+        print("No saved stats state to check.")
+        return False
+    display_names = get_display_names()
+    incremental = _build_stats(state, display_names)
+    full = _build_stats(_rebuild_stats_state(), display_names)
+    incremental.pop("generated_at")
+    full.pop("generated_at")
+
+    mismatched = [k for k in full if json.dumps(full[k]) != json.dumps(incremental.get(k))]
+    if mismatched:
+        print(f"Stats state is inconsistent with full rebuild in: {', '.join(mismatched)}")
+        return False
+    print(f"Stats state is consistent with full rebuild ({full['total_games']} games).")
+    return True
+
+
+@profiled("game.details")
 def _get_game_details(session, request_token, game_name):
-    resp = session.post(
+    resp = _bga_request(
+        session, "POST",
         "https://en.boardgamearena.com/gamelist/gamelist/gameDetails.html",
         headers={
             "X-Request-Token": request_token,
@@ -501,50 +1469,31 @@ def _get_game_details(session, request_token, game_name):
         },
         data=f"game={game_name}",
     )
-    time.sleep(BGA_TIMEOUT)
     return resp.json().get("results", {})
 
 
+@profiled("suggest.new", hotspots=True)
 def suggest_new_games(awards_only=False):
-    with open(GAMES_FILE, "r") as f:
-        games = json.load(f)
+    index = get_catalogue_index()
 
-    played_ids = set()
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r") as f:
-            for entry in json.load(f):
-                played_ids.add(str(entry.get("game_id")))
+    played_ids = get_history_store().game_ids()
 
-    past_suggestions = []
-    if os.path.exists(PAST_SUGGESTIONS_FILE):
-        with open(PAST_SUGGESTIONS_FILE, "r") as f:
-            past_suggestions = json.load(f)
-    past_suggestion_ids = {str(s["id"]) for s in past_suggestions}
+    # Games suggested within the cooldown are still excluded; older ones return to the pool
+    cooling_down_ids = get_suggestion_ledger().active_ids()
 
     AWARD_TAGS = {"Award-winning games", "BGA Awards '25 Nominee", "BGA Awards '25 Winner"}
 
-    # Filter: must support 3 players, have weight >= 50, not already played, not previously suggested
-    games = [g for g in games if (g.get("min_player_number") or 99) <= 3 and (g.get("max_player_number") or 0) >= 3 and (g.get("weight") or 0) >= 50 and str(g.get("id")) not in played_ids and str(g.get("id")) not in past_suggestion_ids]
+    # Filter: must support 3 players, have weight >= 50, not already played, not recently suggested
+    candidates = index.query(players=3, min_weight=50, exclude_ids=played_ids | cooling_down_ids)
 
     if awards_only:
-        games = [g for g in games if AWARD_TAGS & {t.get("name") for t in g.get("tags") or []}]
-
-    buckets = {"Short": [], "Medium": [], "Long": []}
-    for g in games:
-        dur = g.get("average_duration") or 0
-        if dur <= 20:
-            buckets["Short"].append(g)
-        elif dur <= 45:
-            buckets["Medium"].append(g)
-        elif dur <= 75:
-            buckets["Long"].append(g)
-        else:
-            pass
+        candidates &= index.tagged(AWARD_TAGS)
+
+    buckets = {label: index.ids(candidates & index.duration(label)) for label, _ in DURATION_BUCKETS}
 
     # session = _create_session()
-    # resp = session.get("https://en.boardgamearena.com/gamelist?section=all")
-    # time.sleep(BGA_TIMEOUT)
-    # request_token = _extract_request_token(resp)
+    # resp = _bga_request(session, "GET", "https://en.boardgamearena.com/gamelist?section=all")
+    # request_token = _extract_request_token(resp.text)
 
     today = datetime.now().strftime("%Y-%m-%d")
     new_suggestions = []
@@ -553,7 +1502,7 @@ def suggest_new_games(awards_only=False):
         if not pool:
             lines.append(f"\n{label}: No games available")
             continue
-        pick = random.choice(pool)
+        pick = index.game(random.choice(pool))
         new_suggestions.append({"id": str(pick["id"]), "name": pick["display_name_en"], "date": today})
         # details = _get_game_details(session, request_token, pick["name"])
         # description = ""
@@ -582,46 +1531,172 @@ def suggest_new_games(awards_only=False):
     print(output)
 
     if new_suggestions:
-        past_suggestions.extend(new_suggestions)
-        with open(PAST_SUGGESTIONS_FILE, "w") as f:
-            json.dump(past_suggestions, f, indent=2)
+        record_suggestions(new_suggestions)
 
     return output
 
 
-def suggest_forgotten_games():
-    with open(HISTORY_FILE, "r") as f:
-        history = json.load(f)
+def _load_search_index():
+    source = catalogue_source()
+    index = GameSearchIndex.load(SEARCH_INDEX_FILE, source=source)
+    if index is None:
+        index = GameSearchIndex.build(get_catalogue(), source=source)
+        index.save(SEARCH_INDEX_FILE)
+    return index
 
-    # Build game_id -> display_name lookup from games file
-    display_names = {}
-    if os.path.exists(GAMES_FILE):
-        with open(GAMES_FILE, "r") as f:
-            for g in json.load(f):
-                display_names[str(g["id"])] = g["display_name_en"]
 
-    # Only consider plays with all three core players
-    required_players = {"thomaspr", "alice2", "kristiah"}
+def get_search_index():
+    """The name search index, rebuilt only when the catalogue changes."""
+    return memoized("search_index", GAMES_FILES, _load_search_index)
 
-    # Group plays by game_id, tracking play count and last played date
-    game_stats = {}
-    for entry in history:
-        players = set(entry.get("player_names", "").split(","))
-        if not required_players.issubset(players):
-            continue
-        gid = str(entry.get("game_id"))
-        end_ts = int(entry.get("end", 0))
-        if gid not in game_stats:
-            game_stats[gid] = {"game_id": gid, "play_count": 0, "last_played": 0, "game_name": entry.get("game_name")}
-        game_stats[gid]["play_count"] += 1
-        if end_ts > game_stats[gid]["last_played"]:
-            game_stats[gid]["last_played"] = end_ts
-
-    # Filter: played 2+ times and last played more than 12 months ago
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=365)
+
+def find_game(name):
+    """The id of the game best matching ``name`` (a display name, BGA name, alias or id), or None."""
+    if str(name).isdigit():
+        return str(name)
+    return get_search_index().find(name)
+
+
+def search_games(query, limit=10):
+    matches = get_search_index().search(query, limit=limit)
+    if not matches:
+        print(f"No games match '{query}'.")
+        return None
+    for game_id, display_name, score in matches:
+        print(f"{display_name} (id {game_id}, score {score})")
+    return matches
+
+
+def show_rivals(group=None, game=None):
+    """Print the head-to-head record between tracked players from bga_stats.json.
+
+    Each cell is the row player's wins-losses-ties against the column
+    player, overall or at ``game`` (a name or id), followed by each pair's
+    average place gap and score margin.
+    """
+    stats = get_stats()
+    if not stats or "head_to_head" not in stats:
+        stats = generate_stats()
+    head_to_head = stats["head_to_head"]
+    players = [p for p in (group or sorted(head_to_head)) if p in head_to_head]
+
+    game_name, title = None, ""
+    if game:
+        game_id = find_game(game)
+        index = get_catalogue_index()
+        if game_id is None or index is None or game_id not in index.positions:
+            print(f"No game matches '{game}'.")
+            return None
+        game_name = index.game(game_id)["name"]
+        title = f" at {index.game(game_id)['display_name_en']}"
+
+    def record(player, opponent):
+        rivalry = head_to_head[player].get(opponent)
+        if rivalry and game_name:
+            rivalry = rivalry["per_game"].get(game_name)
+        return rivalry
+
+    pairs = [(a, b, record(a, b)) for x, a in enumerate(players) for b in players[x + 1:]]
+    pairs = [(a, b, r) for a, b, r in pairs if r]
+    if not pairs:
+        print(f"No head-to-head tables{title}.")
+        return None
+
+    rows = []
+    for player in players:
+        cells = []
+        for opponent in players:
+            rivalry = record(player, opponent) if opponent != player else None
+            cells.append(f"{rivalry['wins']}-{rivalry['losses']}-{rivalry['ties']}" if rivalry else "-")
+        rows.append(cells)
+    width = max(len(text) for text in players + [cell for cells in rows for cell in cells]) + 2
+    print(f"Head to head{title} (row vs column, W-L-T):")
+    print(" " * width + "".join(p.rjust(width) for p in players))
+    for player, cells in zip(players, rows):
+        print(player.ljust(width) + "".join(cell.rjust(width) for cell in cells))
+    print()
+    for a, b, rivalry in pairs:
+        details = [f"{rivalry['tables']} tables"]
+        if rivalry["avg_place_gap"] is not None:
+            details.append(f"average place gap {rivalry['avg_place_gap']:+}")
+        if rivalry["avg_score_margin"] is not None:
+            details.append(f"average score margin {rivalry['avg_score_margin']:+}")
+        print(f"{a} vs {b}: {rivalry['wins']}-{rivalry['losses']}-{rivalry['ties']} ({', '.join(details)})")
+    return {a: {b: record(a, b) for b in players if b != a and record(a, b)} for a in players}
+
+
+def suggest_added_games(days=7):
+    """Games added to BGA in the last ``days`` days, read from the catalogue changelog."""
+    index = get_catalogue_index()
+    if index is None:
+        print("No catalogue found; run 'games' first.")
+        return None
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    added = [gid for gid in CatalogueChangelog(CATALOGUE_CHANGELOG_FILE).added_since(since) if gid in index.positions]
+    if not added:
+        print(f"No games added to BGA in the last {days} days.")
+        return None
+
+    lines = ["\n*New on BGA This Week:*" if days == 7 else f"\n*New on BGA in the Last {days} Days:*"]
+    for gid in added:
+        game = index.game(gid)
+        game_datas = [f"{game.get('average_duration') or '?'} min"]
+        game_datas += [t["name"] for t in game["tags"] if t.get("category") == "Theme"]
+        lines.append(f"- **{game['display_name_en']}** ({', '.join(game_datas)})")
+
+    output = "\n".join(lines)
+    print(output)
+    return output
+
+
+DEFAULT_GROUP = ("thomaspr", "alice2", "kristiah")
+
+
+@profiled("forgotten.index", hotspots=True)
+def _load_forgotten_index():
+    index = GroupPlayIndex.load(FORGOTTEN_INDEX_FILE)
+    if index is None or index.total_games != len(get_history_store()):
+        index = GroupPlayIndex()
+        for entry in get_history_store().iter_tables():
+            index.add(entry)
+        index.save(FORGOTTEN_INDEX_FILE)
+    return index
+
+
+def get_forgotten_index():
+    """The per-group play index, built on first use and kept up to date by history pulls."""
+    return memoized("forgotten_index", FORGOTTEN_INDEX_FILE, _load_forgotten_index)
+
+
+def _update_forgotten_index(new_tables):
+    # Add newly pulled tables to an existing index; without them (or out of step), rebuild on next use
+    index = GroupPlayIndex.load(FORGOTTEN_INDEX_FILE)
+    if index is None:
+        return
+    if new_tables is not None and index.total_games + len(new_tables) == len(get_history_store()):
+        if new_tables:
+            for entry in new_tables:
+                index.add(entry)
+            index.save(FORGOTTEN_INDEX_FILE)
+        return
+    os.remove(FORGOTTEN_INDEX_FILE)
+
+
+@profiled("suggest.forgotten", hotspots=True)
+def suggest_forgotten_games(group=DEFAULT_GROUP, min_plays=2, older_than_days=365):
+    """Suggest games ``group`` played together ``min_plays``+ times but not in ``older_than_days``.
+
+    A play counts if every player in ``group`` was at the table. Counts and
+    last-played times come from the per-group index, not a history scan.
+    """
+    display_names = get_display_names()
+    game_stats = get_forgotten_index().query(group)
+
+    # Filter: played min_plays+ times and last played before the cutoff
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=older_than_days)
     cutoff_ts = int(cutoff_date.timestamp())
 
-    forgotten = [g for g in game_stats.values() if g["play_count"] >= 2 and g["last_played"] < cutoff_ts]
+    forgotten = [g for g in game_stats.values() if g["play_count"] >= min_plays and g["last_played"] < cutoff_ts]
 
     if not forgotten:
         print("No forgotten games found.")
@@ -649,21 +1724,204 @@ def suggest_forgotten_games():
     return output
 
 
-def send_signal_message(message):
-    api_url = os.environ["SIGNAL_API_URL"]
-    sender = os.environ["SIGNAL_SENDER"]
-    recipient = os.environ["SIGNAL_RECIPIENT"]
-    resp = requests.post(
+@profiled("similar.index", hotspots=True)
+def _load_neighbour_index():
+    catalogue = get_catalogue_index()
+    k = int(load_env().get("BGA_SIMILAR_K", 20))
+    index = NeighbourIndex.load(NEIGHBOUR_INDEX_FILE, source=catalogue.data.get("source"), k=k)
+    if index is None:
+        index = NeighbourIndex.build(catalogue, k=k)
+        index.save(NEIGHBOUR_INDEX_FILE)
+    return index
+
+
+def get_neighbour_index():
+    """Top-k similar games for the whole catalogue, rebuilt only when the catalogue changes."""
+    return memoized("neighbour_index", GAMES_FILES, _load_neighbour_index)
+
+
+@profiled("suggest.similar", hotspots=True)
+def recommend_games(group=DEFAULT_GROUP, limit=5):
+    """Rank unplayed games by tag similarity to the group's favourites in bga_stats.json.
+
+    Each group member's games are seeds weighted by ``log(1 + plays)``, with
+    a bonus for their most played and best weighted-win-rate games. Scores
+    are summed over the seeds' precomputed neighbour lists.
+    """
+    stats = get_stats()
+    if not stats:
+        print("No stats found; run 'stats' first.")
+        return None
+    catalogue = get_catalogue_index()
+    neighbours = get_neighbour_index()
+    name_positions = {name: pos for pos, name in enumerate(catalogue.data["names"])}
+
+    seeds = {}
+    for player in group:
+        ps = stats["per_player"].get(player)
+        if not ps:
+            continue
+        favourites = {ps["most_played_game"], ps["best_weighted_win_rate_game"]}
+        for gname, pg in ps["per_game"].items():
+            pos = name_positions.get(gname)
+            if pos is not None:
+                seeds[pos] = seeds.get(pos, 0.0) + math.log1p(pg["plays"]) + (1.0 if gname in favourites else 0.0)
+
+    # Same pool rules as new suggestions: playable by the group, unplayed, not recently suggested
+    exclude = get_history_store().game_ids() | get_suggestion_ledger().active_ids()
+    candidates = set(catalogue.positions_of(catalogue.query(players=max(len(group), 1), min_weight=50, exclude_ids=exclude)))
+    ranked = neighbours.recommend(seeds, candidates, limit=limit)
+
+    if not ranked:
+        print("No similar games found.")
+        return "No similar games found."
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    lines = ["\n*Games You Might Like:*"]
+    new_suggestions = []
+    for pos, _, seed in ranked:
+        pick = catalogue.game(catalogue.game_ids[pos])
+        seed_name = catalogue.data["display_names"][seed] or catalogue.data["names"][seed]
+        new_suggestions.append({"id": pick["id"], "name": pick["display_name_en"], "date": today})
+        lines.append(f"- **{pick['display_name_en']}** ({pick.get('average_duration', '?')} min) — like {seed_name}")
+
+    output = "\n".join(lines)
+    print(output)
+    record_suggestions(new_suggestions)
+    return output
+
+
+SUGGEST_INTROS = [
+    "It's time for this week's games roundup!",
+    "Game night is calling — here's what's on the radar this week.",
+    "Your weekly game suggestions have arrived!",
+    "What should we play this week? Here are some ideas.",
+    "Fresh off the press: your weekly game recommendations!",
+    "Gather round — it's time to pick what we're playing this week.",
+    "It's that time again — let's figure out what we're playing!",
+    "Who needs Netflix? Here's what we should be playing this week.",
+    "Another week, another chance to find your next favourite game.",
+    "Here's what BGA has in store for us this week.",
+    "Meeples at the ready! Here are this week's suggestions.",
+]
+
+
+def suggest_games(awards_only=False):
+    """Forgotten, new and newly added games together, as the weekly message."""
+    parts = []
+    result = suggest_forgotten_games()
+    if result:
+        parts.append(result.strip())
+    result = suggest_new_games(awards_only)
+    if result:
+        parts.append(result.strip())
+    result = suggest_added_games()
+    if result:
+        parts.append(result.strip())
+    return random.choice(SUGGEST_INTROS) + "\n\n" + "\n\n".join(parts)
+
+
+def _signal_recipients(env):
+    # Phone numbers or "group.<id>" ids, comma-separated
+    recipients = env.get("SIGNAL_RECIPIENTS") or env.get("SIGNAL_RECIPIENT", "")
+    return [r.strip() for r in recipients.split(",") if r.strip()]
+
+
+def _get_signal_outbox():
+    global _signal_outbox
+    if _signal_outbox is None:
+        env = load_env()
+        _signal_outbox = Outbox(
+            SIGNAL_OUTBOX_DIR,
+            backoff=float(env.get("SIGNAL_RETRY_SECONDS", 60)),
+            max_attempts=int(env.get("SIGNAL_MAX_ATTEMPTS", 10)),
+        )
+    return _signal_outbox
+
+
+def _get_signal_session():
+    # One pooled session shared by every send, so fan-out reuses connections
+    global _signal_session
+    if _signal_session is None:
+        import requests
+        from bga_transport import configure_session
+
+        _signal_session = configure_session(requests.Session(), load_env())
+    return _signal_session
+
+
+def _deliver_signal(session, api_url, sender, entry):
+    start = time.perf_counter()
+    resp = session.post(
         f"{api_url}/v2/send",
         json={
-            "message": message,
+            "message": entry["message"],
             "text_mode": "styled",
             "number": sender,
-            "recipients": [recipient],
+            "recipients": [entry["recipient"]],
         },
+        timeout=SIGNAL_TIMEOUT,
+    )
+    bga_profile.observe(
+        "response", method="POST", url=resp.url, status=resp.status_code,
+        bytes=len(resp.content), latency=time.perf_counter() - start,
     )
     resp.raise_for_status()
-    print("Signal message sent.")
+
+
+@profiled("signal.flush")
+def flush_signal_outbox(batch_size=None):
+    """Send every due outbox entry, up to ``batch_size``. Returns (sent, still pending)."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    outbox = _get_signal_outbox()
+    env = load_env()
+    due = outbox.due(limit=batch_size or int(env.get("SIGNAL_BATCH_SIZE", 50)))
+    if not due:
+        return 0, len(outbox.pending())
+    api_url, sender = env.get("SIGNAL_API_URL"), env.get("SIGNAL_SENDER")
+    if not api_url or not sender:
+        print(f"Signal is not configured (SIGNAL_API_URL, SIGNAL_SENDER); {len(due)} queued message(s) left in the outbox.")
+        return 0, len(outbox.pending())
+    session = _get_signal_session()
+
+    def deliver(entry):
+        try:
+            _deliver_signal(session, api_url, sender, entry)
+            return None
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=int(env.get("SIGNAL_WORKERS", 4))) as pool:
+        errors = list(pool.map(deliver, due))
+
+    sent = 0
+    for entry, error in zip(due, errors):
+        if error is None:
+            outbox.mark_sent(entry)
+            sent += 1
+        elif outbox.mark_failed(entry, error):
+            print(f"Signal send to {entry['recipient']} failed ({error}); retry {entry['attempts']} queued.")
+        else:
+            print(f"Signal send to {entry['recipient']} failed ({error}); gave up after {entry['attempts']} attempts.")
+    pending = len(outbox.pending())
+    print(f"Signal: sent {sent} of {len(due)} queued message(s)" + (f", {pending} still queued." if pending else "."))
+    return sent, pending
+
+
+def send_signal_message(message):
+    """Queue ``message`` for every Signal recipient and try to deliver it.
+
+    The message is in the outbox before anything is sent; whatever cannot
+    be delivered now is retried on later runs, so this never raises for a
+    failed send.
+    """
+    recipients = _signal_recipients(load_env())
+    if not recipients:
+        print("No SIGNAL_RECIPIENTS configured; message not queued.")
+        return
+    _get_signal_outbox().enqueue(message, recipients)
+    flush_signal_outbox()
 
 
 if __name__ == "__main__":
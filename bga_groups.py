@@ -0,0 +1,70 @@
+from bga_storage import load_binary, save_binary
+
+
+def table_group(entry):
+    """The sorted, comma-joined player names of a history entry."""
+    return ",".join(sorted({p for p in entry.get("player_names", "").split(",") if p}))
+
+
+class GroupPlayIndex:
+    """Play count and last-played time per (player group, game).
+
+    A table's group is the exact set of players at it. Counts and last-played
+    times merge in any order, so new tables are added as they are pulled,
+    oldest or newest. A query for "games played with at least these players"
+    sums the groups that contain them: there are far fewer distinct groups
+    than tables, so no history is scanned.
+    """
+
+    VERSION = 1
+
+    def __init__(self, data=None):
+        self.data = data or {
+            "version": self.VERSION,
+            "total_games": 0,
+            "groups": {},   # group -> game_id -> [play_count, last_played_ts, game_name]
+        }
+
+    @property
+    def total_games(self):
+        return self.data["total_games"]
+
+    @classmethod
+    def load(cls, path):
+        data = load_binary(path)
+        return cls(data) if data is not None and data.get("version") == cls.VERSION else None
+
+    def save(self, path):
+        save_binary(path, self.data)
+
+    def add(self, entry):
+        self.data["total_games"] += 1
+        games = self.data["groups"].setdefault(table_group(entry), {})
+        gid = str(entry.get("game_id"))
+        end_ts = int(entry.get("end") or 0)
+        game = games.get(gid)
+        if game is None:
+            games[gid] = [1, end_ts, entry.get("game_name")]
+            return
+        game[0] += 1
+        if end_ts > game[1]:
+            game[1] = end_ts
+            game[2] = entry.get("game_name")
+
+    def query(self, players):
+        """game_id -> {play_count, last_played, game_name} over tables that included all of ``players``."""
+        required = set(players)
+        out = {}
+        for group, games in self.data["groups"].items():
+            if not required.issubset(group.split(",")):
+                continue
+            for gid, (play_count, last_played, game_name) in games.items():
+                game = out.get(gid)
+                if game is None:
+                    out[gid] = {"game_id": gid, "play_count": play_count, "last_played": last_played, "game_name": game_name}
+                    continue
+                game["play_count"] += play_count
+                if last_played > game["last_played"]:
+                    game["last_played"] = last_played
+                    game["game_name"] = game_name
+        return out
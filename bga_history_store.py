@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+
+from bga_storage import save_json
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_id TEXT NOT NULL UNIQUE,
+    game_id TEXT,
+    game_name TEXT,
+    end_ts INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tables_game_id ON tables (game_id);
+CREATE INDEX IF NOT EXISTS idx_tables_end_ts ON tables (end_ts);
+CREATE TABLE IF NOT EXISTS table_players (
+    table_id TEXT NOT NULL,
+    player TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (table_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_table_players_player ON table_players (player);
+"""
+
+
+class HistoryStore:
+    """Append-only store of finished BGA tables, backed by SQLite.
+
+    Rows are never rewritten: each pull appends its new tables, oldest first.
+    Tables are ordered by end timestamp (then insertion ``seq``), which is
+    the order BGA returns them in, so a backfill of older games slots in
+    behind the newer ones already stored. ``table_id`` is unique,
+    and there are secondary indexes on game id, end timestamp and player, so
+    lookups such as "all plays of game X" need no scan. Each row keeps the
+    table exactly as BGA returned it, and ``export_json`` writes the
+    newest-first list that bga_history.json has always held.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tables").fetchone()[0]
+
+    def __contains__(self, table_id):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM tables WHERE table_id = ?", (str(table_id),)).fetchone()
+        return row is not None
+
+    def append(self, tables):
+        """Append tables given newest first, as BGA returns them. Returns how many were new."""
+        added = 0
+        with self._lock, self._conn:
+            for table in reversed(list(tables)):
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO tables (table_id, game_id, game_name, end_ts, data) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        str(table["table_id"]),
+                        str(table.get("game_id", "")),
+                        table.get("game_name", ""),
+                        int(table.get("end") or 0),
+                        json.dumps(table),
+                    ),
+                )
+                if not cur.rowcount:
+                    continue
+                added += 1
+                players = [p.strip() for p in (table.get("player_names") or "").split(",")]
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO table_players (table_id, player, position) VALUES (?, ?, ?)",
+                    [(str(table["table_id"]), p, i) for i, p in enumerate(players) if p],
+                )
+        return added
+
+    def iter_tables(self, newest_first=True, chunk_size=1000):
+        """Yield every table in end order, reading ``chunk_size`` rows at a time.
+
+        Each chunk is a keyset query on ``(end_ts, seq)``, which the end
+        timestamp index already orders, so memory use does not grow with the
+        history and the store is not locked between chunks.
+        """
+        order, after = ("DESC", "<") if newest_first else ("ASC", ">")
+        cursor = None
+        while True:
+            where = f"WHERE (end_ts, seq) {after} (?, ?)" if cursor else ""
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT end_ts, seq, data FROM tables {where} ORDER BY end_ts {order}, seq {order} LIMIT ?",
+                    (*(cursor or ()), chunk_size),
+                ).fetchall()
+            for _, _, data in rows:
+                yield json.loads(data)
+            if len(rows) < chunk_size:
+                return
+            cursor = rows[-1][:2]
+
+    def all(self):
+        """Every table, newest first."""
+        return list(self.iter_tables())
+
+    def by_game(self, game_id):
+        return self._query("SELECT data FROM tables WHERE game_id = ? ORDER BY end_ts DESC, seq DESC", (str(game_id),))
+
+    def by_player(self, player):
+        return self._query(
+            "SELECT t.data FROM tables t JOIN table_players p ON p.table_id = t.table_id "
+            "WHERE p.player = ? ORDER BY t.end_ts DESC, t.seq DESC",
+            (player,),
+        )
+
+    def between(self, start_ts=None, end_ts=None):
+        """Tables whose end timestamp falls within [start_ts, end_ts]."""
+        return self._query(
+            "SELECT data FROM tables WHERE end_ts >= ? AND end_ts <= ? ORDER BY end_ts DESC, seq DESC",
+            (start_ts if start_ts is not None else 0, end_ts if end_ts is not None else 2**62),
+        )
+
+    def game_ids(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT game_id FROM tables").fetchall()
+        return {r[0] for r in rows}
+
+    def import_json(self, path):
+        with open(path, "r") as f:
+            return self.append(json.load(f))
+
+    def export_json(self, path):
+        tables = self.all()
+        save_json(path, tables, indent=2)
+        return len(tables)
+
+    def _query(self, sql, params):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+
+def open_history_store(path, legacy_json=None):
+    """Open the store, importing ``legacy_json`` the first time it is created."""
+    store = HistoryStore(path)
+    if legacy_json and len(store) == 0 and os.path.exists(legacy_json):
+        added = store.import_json(legacy_json)
+        print(f"Imported {added} games from {legacy_json} into {path}.")
+    return store
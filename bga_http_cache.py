@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from bga_storage import save_json
+
+
+class CacheMiss(Exception):
+    pass
+
+
+def body_digest(text):
+    """The hash a page body is stored under."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class HTTPCache:
+    """Persistent conditional-GET cache for BGA pages.
+
+    Bodies are stored once under ``bodies/<sha256>`` and ``index.json`` maps
+    each URL to its ETag/Last-Modified validators and body hash. A refetch
+    sends the validators, so an unchanged page costs one 304 and no parsing.
+
+    ``mode`` is ``"on"`` (default), ``"readonly"`` (serve from the cache and
+    never touch the network, for offline runs and tests) or ``"off"``.
+    """
+
+    def __init__(self, cache_dir, mode="on"):
+        if mode not in ("on", "readonly", "off"):
+            raise ValueError(f"Unknown HTTP cache mode: {mode}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.bodies_dir = os.path.join(cache_dir, "bodies")
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get(self, send, url, **kwargs):
+        """Fetch ``url`` with ``send(method, url, **kwargs)``.
+
+        Returns ``(text, changed)``, where ``changed`` is False when the page
+        is the same as the last cached copy. The cached copy is stored as soon
+        as it arrives, so a caller that may fail to process the page should
+        compare ``body_digest(text)`` with one it saved with its own result.
+        """
+        if self.mode == "off":
+            resp = send("GET", url, **kwargs)
+            resp.raise_for_status()
+            return resp.text, True
+
+        entry = self._entry(url)
+        if self.mode == "readonly":
+            if entry is None:
+                raise CacheMiss(f"{url} is not in the HTTP cache (read-only mode)")
+            return self._read_body(entry["body"]), False
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        resp = send("GET", url, headers=headers, **kwargs)
+        if resp.status_code == 304 and entry is not None:
+            self._store(url, entry["body"], resp, entry)
+            return self._read_body(entry["body"]), False
+        resp.raise_for_status()
+
+        text = resp.text
+        digest = body_digest(text)
+        changed = entry is None or entry["body"] != digest
+        if changed:
+            os.makedirs(self.bodies_dir, exist_ok=True)
+            with open(os.path.join(self.bodies_dir, digest), "w", encoding="utf-8") as f:
+                f.write(text)
+        self._store(url, digest, resp, entry)
+        return text, changed
+
+    def _entry(self, url):
+        with self._lock:
+            return self._load_index().get(url)
+
+    def _read_body(self, digest):
+        with open(os.path.join(self.bodies_dir, digest), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            if os.path.exists(self.index_file):
+                try:
+                    with open(self.index_file, "r") as f:
+                        self._index = json.load(f)
+                except (json.JSONDecodeError, ValueError) as e:
+                    print(f"Could not load HTTP cache index: {e}")
+        return self._index
+
+    def _store(self, url, digest, resp, previous):
+        previous = previous or {}
+        with self._lock:
+            index = self._load_index()
+            index[url] = {
+                "etag": resp.headers.get("ETag") or previous.get("etag"),
+                "last_modified": resp.headers.get("Last-Modified") or previous.get("last_modified"),
+                "body": digest,
+                "checked_at": datetime.now(timezone.utc).isoformat(),
+            }
+            old_digest = previous.get("body")
+            if old_digest and old_digest != digest and all(e["body"] != old_digest for e in index.values()):
+                try:
+                    os.remove(os.path.join(self.bodies_dir, old_digest))
+                except FileNotFoundError:
+                    pass
+            os.makedirs(self.cache_dir, exist_ok=True)
+            save_json(self.index_file, index, indent=2)
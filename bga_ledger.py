@@ -0,0 +1,89 @@
+import json
+import os
+from datetime import date, timedelta
+
+from bga_storage import atomic_write
+
+
+class SuggestionLedger:
+    """Append-only log of suggested games, one JSON object per line.
+
+    ``latest`` maps each game id to its most recent suggestion, so checking
+    whether a game is still cooling down is a dict lookup. A suggestion
+    expires back into the pool ``cooldown_days`` after it was made (never,
+    if ``cooldown_days`` is None).
+
+    New suggestions are only ever appended. Once the file holds more than
+    twice as many lines as live suggestions, ``compact`` rewrites it with
+    just the latest entry per game that is still cooling down, writing to a
+    temporary file and renaming it over the ledger.
+    """
+
+    COMPACT_MIN_LINES = 100
+
+    def __init__(self, path, cooldown_days=None):
+        self.path = path
+        self.cooldown_days = cooldown_days
+        self.latest = {}
+        self.lines = 0
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted append
+                    continue
+                self.lines += 1
+                self.latest[str(entry["id"])] = entry
+
+    def __len__(self):
+        return len(self.latest)
+
+    def _expired(self, entry, today):
+        if self.cooldown_days is None:
+            return False
+        return date.fromisoformat(entry["date"]) + timedelta(days=self.cooldown_days) <= today
+
+    def cooling_down(self, game_id, today=None):
+        entry = self.latest.get(str(game_id))
+        return entry is not None and not self._expired(entry, today or date.today())
+
+    def active_ids(self, today=None):
+        """Ids of every game still cooling down."""
+        today = today or date.today()
+        return {gid for gid, entry in self.latest.items() if not self._expired(entry, today)}
+
+    def append(self, entries):
+        """Record ``entries`` (dicts with ``id``, ``name`` and ``date``)."""
+        entries = list(entries)
+        if not entries:
+            return
+        with open(self.path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        for entry in entries:
+            self.latest[str(entry["id"])] = entry
+        self.lines += len(entries)
+        if self.lines >= self.COMPACT_MIN_LINES and self.lines > 2 * len(self.active_ids()):
+            self.compact()
+
+    def compact(self, today=None):
+        """Rewrite the ledger with only live entries. Returns how many lines were dropped."""
+        today = today or date.today()
+        live = sorted(
+            (entry for entry in self.latest.values() if not self._expired(entry, today)),
+            key=lambda entry: entry["date"],
+        )
+        with atomic_write(self.path) as f:
+            for entry in live:
+                f.write(json.dumps(entry) + "\n")
+        dropped = self.lines - len(live)
+        self.latest = {str(entry["id"]): entry for entry in live}
+        self.lines = len(live)
+        return dropped
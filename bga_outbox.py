@@ -0,0 +1,89 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+from bga_storage import save_json
+
+
+class Outbox:
+    """Persistent queue of outgoing messages, one JSON file per (message, recipient).
+
+    A message is written to disk for every recipient before anything is
+    sent, so it survives a failed send or a crash. Delivered entries are
+    deleted; failed ones are rescheduled with exponential backoff and kept
+    until they are delivered or run out of attempts, when they are moved to
+    ``failed/``. Entries are written atomically, so a reader never sees a
+    half-written one.
+    """
+
+    def __init__(self, directory, backoff=60.0, max_backoff=6 * 3600.0, max_attempts=10):
+        self.directory = directory
+        self.failed_dir = os.path.join(directory, "failed")
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, entry):
+        return os.path.join(self.directory, f"{entry['id']}.json")
+
+    def _write(self, entry, path=None):
+        save_json(path or self._path(entry), entry, indent=2)
+
+    def enqueue(self, message, recipients):
+        """Queue ``message`` for every recipient. Returns the new entries."""
+        message_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        entries = []
+        for i, recipient in enumerate(recipients):
+            entry = {
+                "id": f"{message_id}-{i}",
+                "recipient": recipient,
+                "message": message,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "attempts": 0,
+                "next_attempt_at": 0,
+                "last_error": None,
+            }
+            self._write(entry)
+            entries.append(entry)
+        return entries
+
+    def pending(self):
+        entries = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r") as f:
+                    entries.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                continue
+        return entries
+
+    def due(self, limit=None, now=None):
+        """Pending entries whose retry time has come, oldest first."""
+        now = now if now is not None else time.time()
+        entries = [e for e in self.pending() if e["next_attempt_at"] <= now]
+        return entries[:limit] if limit else entries
+
+    def mark_sent(self, entry):
+        try:
+            os.remove(self._path(entry))
+        except FileNotFoundError:
+            pass
+
+    def mark_failed(self, entry, error):
+        """Reschedule ``entry``. Returns False once it has used up its attempts."""
+        entry["attempts"] += 1
+        entry["last_error"] = str(error)
+        if entry["attempts"] >= self.max_attempts:
+            os.makedirs(self.failed_dir, exist_ok=True)
+            self._write(entry, os.path.join(self.failed_dir, f"{entry['id']}.json"))
+            self.mark_sent(entry)
+            return False
+        delay = min(self.max_backoff, self.backoff * (2 ** (entry["attempts"] - 1)))
+        entry["next_attempt_at"] = time.time() + delay
+        self._write(entry)
+        return True
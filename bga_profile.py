@@ -0,0 +1,180 @@
+"""Phase timings, HTTP counters and hotspots for ``cli.py --profile``.
+
+Everything here is a no-op until ``enable()`` is called, so the
+instrumentation left in the code paths costs nothing on normal runs;
+cProfile and pstats are only imported once a hotspot phase runs.
+
+- ``phase(name)`` times a nested block. ``category="json"`` marks JSON
+  load/dump blocks, ``category="storage"`` marks binary (``.bin``) ones,
+  and ``hotspots=True`` also runs cProfile over it.
+- ``observe(event, ...)`` is the request scheduler's observer. It records
+  each response (count, bytes, latency) and keeps time spent sleeping for
+  the rate limit or a backoff apart from time spent waiting on the server.
+"""
+import functools
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_started = None
+_root = {"name": "run", "children": []}
+_requests = []
+_sleeps = {"throttle": 0.0, "backoff": 0.0}
+_hotspots = {}
+
+
+def enable():
+    global _enabled, _started
+    _enabled = True
+    _started = time.perf_counter()
+
+
+def enabled():
+    return _enabled
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = [_root]
+    return _local.stack
+
+
+@contextmanager
+def phase(name, category=None, hotspots=False):
+    if not _enabled:
+        yield
+        return
+    stack = _stack()
+    node = {"name": name, "start_s": round(time.perf_counter() - _started, 6), "children": []}
+    if category:
+        node["category"] = category
+    with _lock:
+        stack[-1]["children"].append(node)
+    stack.append(node)
+    # Only one cProfile session can run at a time; nested hotspot phases share the outer one
+    profiler = None
+    if hotspots and not getattr(_local, "profiling", False):
+        import cProfile
+        profiler = cProfile.Profile()
+    if profiler:
+        _local.profiling = True
+    start = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            _local.profiling = False
+            _collect_hotspots(name, profiler)
+        node["duration_s"] = round(time.perf_counter() - start, 6)
+        stack.pop()
+
+
+def profiled(name, **phase_kwargs):
+    """Decorator form of ``phase``."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name, **phase_kwargs):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _collect_hotspots(name, profiler, limit=15):
+    import pstats
+
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{func} ({filename.rsplit('/', 1)[-1]}:{line})",
+            "calls": ncalls,
+            "self_s": round(tottime, 6),
+            "cumulative_s": round(cumtime, 6),
+        })
+    rows.sort(key=lambda r: -r["self_s"])
+    with _lock:
+        _hotspots[name] = rows[:limit]
+
+
+def observe(event, **details):
+    """Observer hook for RequestScheduler and other HTTP senders."""
+    if not _enabled:
+        return
+    with _lock:
+        if event in _sleeps:
+            _sleeps[event] += details["seconds"]
+        elif event == "response":
+            _requests.append({
+                "method": details["method"],
+                "url": details["url"].split("?", 1)[0],
+                "status": details["status"],
+                "bytes": details["bytes"],
+                "latency_s": round(details["latency"], 6),
+            })
+
+
+def _walk(node, depth=0):
+    for child in node["children"]:
+        yield depth, child
+        yield from _walk(child, depth + 1)
+
+
+def _category_totals(category):
+    nodes = [n for _, n in _walk(_root) if n.get("category") == category]
+    return {
+        "operations": len(nodes),
+        "duration_s": round(sum(n.get("duration_s", 0) for n in nodes), 6),
+    }
+
+
+def trace():
+    return {
+        "total_s": round(time.perf_counter() - _started, 6) if _started else 0,
+        "phases": _root["children"],
+        "http": {
+            "requests": len(_requests),
+            "bytes": sum(r["bytes"] for r in _requests),
+            "latency_s": round(sum(r["latency_s"] for r in _requests), 6),
+            "throttle_sleep_s": round(_sleeps["throttle"], 6),
+            "backoff_sleep_s": round(_sleeps["backoff"], 6),
+            "calls": _requests,
+        },
+        "json": _category_totals("json"),
+        "storage": _category_totals("storage"),
+        "hotspots": _hotspots,
+    }
+
+
+def write_trace(path):
+    with open(path, "w") as f:
+        json.dump(trace(), f, indent=2)
+
+
+def print_summary():
+    data = trace()
+    print(f"\nProfile ({data['total_s']:.3f}s total)")
+    print(f"{'phase':<44} {'time':>10}")
+    for depth, node in _walk(_root):
+        label = ("  " * depth + node["name"])[:44]
+        print(f"{label:<44} {node.get('duration_s', 0) * 1000:>8.1f}ms")
+    http = data["http"]
+    print(
+        f"\nHTTP: {http['requests']} requests, {http['bytes'] / 1e3:.1f} kB, "
+        f"{http['latency_s']:.3f}s waiting on the server, "
+        f"{http['throttle_sleep_s']:.3f}s rate-limit sleep, {http['backoff_sleep_s']:.3f}s backoff sleep"
+    )
+    print(f"JSON: {data['json']['operations']} loads/dumps, {data['json']['duration_s']:.3f}s")
+    print(f"Storage: {data['storage']['operations']} binary loads/dumps, {data['storage']['duration_s']:.3f}s")
+    for name, rows in data["hotspots"].items():
+        print(f"\nHotspots in {name}:")
+        for row in rows[:5]:
+            print(f"  {row['self_s'] * 1000:>8.1f}ms  {row['calls']:>8}  {row['function']}")
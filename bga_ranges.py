@@ -0,0 +1,129 @@
+"""Prefix sums over end timestamps, for stats over any date range.
+
+Every aggregate the range query reports is a *series*: the sorted end
+timestamps of the plays it counts, plus running totals (wins, rank sums,
+durations) with a leading zero. The totals over ``[start, end]`` are then
+two bisections and a subtraction per series, with no scan of the history:
+
+    lo, hi = bisect_left(ends, start), bisect_right(ends, end)
+    plays, wins = hi - lo, wins_cum[hi] - wins_cum[lo]
+
+There is one series per player, per game and per (player, game). Tables
+with no end timestamp cannot fall in a range and are only counted in
+``total_games``, which is how the index is checked against the history.
+"""
+from bisect import bisect_left, bisect_right
+
+from bga_storage import load_binary, save_binary
+
+PLAYER_FIELDS = ("wins", "rank_sum", "rank_count")
+GAME_FIELDS = ("duration_sum", "duration_count")
+PAIR_FIELDS = ("wins",)
+
+
+def _new_series(fields):
+    return [[]] + [[0] for _ in fields]
+
+
+def _append(series, end_ts, values):
+    series[0].append(end_ts)
+    for cum, value in zip(series[1:], values):
+        cum.append(cum[-1] + value)
+
+
+def _totals(series, start_ts, end_ts):
+    """``(count, [field totals])`` for plays ending within ``[start_ts, end_ts]``."""
+    ends = series[0]
+    lo, hi = bisect_left(ends, start_ts), bisect_right(ends, end_ts)
+    return hi - lo, [cum[hi] - cum[lo] for cum in series[1:]]
+
+
+class RangeIndex:
+    VERSION = 1
+
+    def __init__(self, data=None):
+        self.data = data or {
+            "version": self.VERSION,
+            "total_games": 0,
+            "max_end": 0,
+            "all": [],          # end timestamps of every dated table
+            "game_ids": {},     # game_name -> latest game id
+            "players": {},      # player -> series of PLAYER_FIELDS
+            "games": {},        # game_name -> series of GAME_FIELDS
+            "pairs": {},        # player -> game_name -> series of PAIR_FIELDS
+        }
+
+    @property
+    def total_games(self):
+        return self.data["total_games"]
+
+    @classmethod
+    def load(cls, path):
+        data = load_binary(path)
+        return cls(data) if data is not None and data.get("version") == cls.VERSION else None
+
+    def save(self, path):
+        save_binary(path, self.data)
+
+    def add(self, end_ts, game_id, game_name, duration, players):
+        """Index one table; ``players`` is ``[(player, rank or None), ...]``.
+
+        Tables must be added in end order. Returns False, without changing the
+        index, for a table that ends before the newest one indexed, in which
+        case the index has to be rebuilt.
+        """
+        if end_ts and end_ts < self.data["max_end"]:
+            return False
+        self.data["total_games"] += 1
+        if not end_ts:
+            return True
+        d = self.data
+        d["max_end"] = end_ts
+        d["all"].append(end_ts)
+        d["game_ids"][game_name] = game_id
+        game = d["games"].setdefault(game_name, _new_series(GAME_FIELDS))
+        _append(game, end_ts, (duration or 0, 1 if duration is not None else 0))
+        for player, rank in players:
+            win = 1 if rank == 1 else 0
+            series = d["players"].setdefault(player, _new_series(PLAYER_FIELDS))
+            _append(series, end_ts, (win, rank or 0, 1 if rank is not None else 0))
+            pair = d["pairs"].setdefault(player, {}).setdefault(game_name, _new_series(PAIR_FIELDS))
+            _append(pair, end_ts, (win,))
+        return True
+
+    def query(self, start_ts, end_ts):
+        """Raw totals for plays ending within ``[start_ts, end_ts]``; empty aggregates are left out."""
+        d = self.data
+        out = {
+            "total_games": bisect_right(d["all"], end_ts) - bisect_left(d["all"], start_ts),
+            "players": {},
+            "games": {},
+        }
+        for game_name, series in d["games"].items():
+            plays, (duration_sum, duration_count) = _totals(series, start_ts, end_ts)
+            if plays:
+                out["games"][game_name] = {
+                    "game_id": d["game_ids"][game_name],
+                    "play_count": plays,
+                    "duration_sum": duration_sum,
+                    "duration_count": duration_count,
+                    "per_player": {},
+                }
+        for player, series in d["players"].items():
+            plays, (wins, rank_sum, rank_count) = _totals(series, start_ts, end_ts)
+            if not plays:
+                continue
+            per_game = {}
+            for game_name, pair in d["pairs"][player].items():
+                pair_plays, (pair_wins,) = _totals(pair, start_ts, end_ts)
+                if pair_plays:
+                    per_game[game_name] = {"plays": pair_plays, "wins": pair_wins}
+                    out["games"][game_name]["per_player"][player] = per_game[game_name]
+            out["players"][player] = {
+                "games_played": plays,
+                "wins": wins,
+                "rank_sum": rank_sum,
+                "rank_count": rank_count,
+                "per_game": per_game,
+            }
+        return out
@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RequestScheduler:
+    """Single gate for every request sent to BGA.
+
+    Requests are spaced by a shared token bucket rather than a fixed sleep
+    after each response, so time spent waiting on the server counts towards
+    the politeness budget. Responses with a 429/5xx status (or connection
+    errors) are retried with exponential backoff, honouring ``Retry-After``.
+
+    ``observer``, if given, is called as ``observer("throttle", seconds=...)``,
+    ``observer("backoff", seconds=...)`` and ``observer("response", method=...,
+    url=..., status=..., bytes=..., latency=...)``.
+    """
+
+    def __init__(self, rate, burst=1, workers=4, max_retries=4, backoff=2.0, observer=None):
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.observer = observer
+
+    def _notify(self, event, **details):
+        if self.observer is not None:
+            self.observer(event, **details)
+
+    def request(self, session, method, url, **kwargs):
+        attempt = 0
+        while True:
+            self._notify("throttle", seconds=self.bucket.acquire())
+            start = time.perf_counter()
+            try:
+                resp = session.request(method, url, **kwargs)
+            except OSError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                print(f"  Request to {url} failed ({e}), retrying in {delay:.1f}s...")
+            else:
+                self._notify(
+                    "response", method=method, url=url, status=resp.status_code,
+                    bytes=len(resp.content), latency=time.perf_counter() - start,
+                )
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return resp
+                delay = self._retry_after(resp) or self._backoff_delay(attempt)
+                print(f"  Got HTTP {resp.status_code} from {url}, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+            self._notify("backoff", seconds=delay)
+            attempt += 1
+
+    def map(self, fn, items):
+        """Run ``fn`` over independent ``items`` on a bounded worker pool.
+
+        Results come back in input order. Every request made by ``fn`` still
+        goes through the shared token bucket.
+        """
+        items = list(items)
+        if self.workers == 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as pool:
+            return list(pool.map(fn, items))
+
+    def _backoff_delay(self, attempt):
+        return self.backoff * (2 ** attempt) * random.uniform(0.75, 1.25)
+
+    @staticmethod
+    def _retry_after(resp):
+        value = resp.headers.get("Retry-After")
+        try:
+            return max(0.0, float(value)) if value else None
+        except ValueError:
+            return None
@@ -0,0 +1,108 @@
+"""Fuzzy game lookup by name.
+
+Every game's display name, BGA name and aliases are normalised (lower
+case, accents and punctuation dropped) and split into trigrams, padded so
+that word starts get their own trigrams. A query is scored against each
+matching name by trigram overlap (Dice coefficient), with a bonus when the
+name starts with the query and more when it is the query exactly, so
+"ttr", "ticket to" and "tiket to ride" all find Ticket to Ride. Only the
+names that share a trigram with the query are ever looked at.
+
+The index is built from the catalogue and saved until the catalogue changes.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+
+from bga_storage import load_binary, save_binary
+
+SEARCH_INDEX_VERSION = 1
+# Catalogue fields the index is built from
+NAME_FIELDS = ("display_name_en", "name", "aliases")
+PREFIX_BONUS = 0.5
+EXACT_BONUS = 1.0
+MIN_SCORE = 0.3
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalise(text):
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class GameSearchIndex:
+    """Trigram postings over every name a game is known by."""
+
+    def __init__(self, data):
+        self.data = data
+        self.game_ids = data["game_ids"]
+        self.display_names = data["display_names"]
+        self.terms = data["terms"]          # [normalised name, game position, trigram count]
+        self.postings = data["postings"]    # trigram -> [term positions]
+
+    @classmethod
+    def build(cls, games, source=None):
+        game_ids, display_names, terms = [], [], []
+        postings = defaultdict(list)
+        for pos, g in enumerate(games):
+            game_ids.append(str(g["id"]))
+            display_names.append(g.get("display_name_en") or g.get("name"))
+            names = {normalise(n) for n in [g.get("display_name_en"), g.get("name"), *(g.get("aliases") or [])]}
+            for term in sorted(n for n in names if n):
+                grams = trigrams(term)
+                for gram in grams:
+                    postings[gram].append(len(terms))
+                terms.append([term, pos, len(grams)])
+        return cls({
+            "version": SEARCH_INDEX_VERSION,
+            "source": source,
+            "game_ids": game_ids,
+            "display_names": display_names,
+            "terms": terms,
+            "postings": dict(postings),
+        })
+
+    @classmethod
+    def load(cls, path, source=None):
+        """Load a saved index, or None if missing, outdated or built from another catalogue."""
+        data = load_binary(path)
+        if data is None or data.get("version") != SEARCH_INDEX_VERSION or data.get("source") != source:
+            return None
+        return cls(data)
+
+    def save(self, path):
+        save_binary(path, self.data)
+
+    def search(self, query, limit=10):
+        """Best matches for ``query`` as ``[(game_id, display_name, score)]``, best first."""
+        query = normalise(query)
+        if not query:
+            return []
+        grams = trigrams(query)
+        shared = defaultdict(int)
+        for gram in grams:
+            for term_pos in self.postings.get(gram, ()):
+                shared[term_pos] += 1
+
+        best = {}  # game position -> best score over its names
+        for term_pos, count in shared.items():
+            term, pos, term_grams = self.terms[term_pos]
+            score = 2 * count / (len(grams) + term_grams)
+            if term == query:
+                score += EXACT_BONUS
+            elif term.startswith(query):
+                score += PREFIX_BONUS
+            if score >= MIN_SCORE and score > best.get(pos, 0.0):
+                best[pos] = score
+        ranked = sorted(best.items(), key=lambda x: (-x[1], self.display_names[x[0]]))[:limit]
+        return [(self.game_ids[pos], self.display_names[pos], round(score, 3)) for pos, score in ranked]
+
+    def find(self, query):
+        """The id of the single best match for ``query``, or None."""
+        matches = self.search(query, limit=1)
+        return matches[0][0] if matches else None
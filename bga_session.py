@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from bga_storage import save_json
+
+
+class AuthError(Exception):
+    """BGA rejected a request because the session or request token is no longer valid."""
+
+
+class SessionManager:
+    """One logged-in BGA session per process, saved between runs.
+
+    The cookies and request token are saved together, so a later run reuses
+    both without a round trip. A saved session is not checked up front: the
+    first real call checks it, and only when BGA answers with an auth failure
+    (``AuthError``) does ``reauthenticate`` log in again. Every caller shares
+    the same ``requests.Session`` and its keep-alive connection pool.
+
+    ``create_session()`` returns a new ``requests.Session``,
+    ``authenticate(session)`` logs it in, and ``fetch_token(session)``
+    returns the request token for a logged-in session.
+    """
+
+    def __init__(self, path, create_session, authenticate, fetch_token):
+        self.path = path
+        self._create_session = create_session
+        self._authenticate = authenticate
+        self._fetch_token = fetch_token
+        self._lock = threading.Lock()
+        self.session = None
+        self.request_token = None
+        self.logged_in_at = None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            data["logged_in_at"] = datetime.fromisoformat(data["datetime"])
+            return data
+        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            print(f"Could not load saved session: {e}")
+            return None
+
+    def save(self):
+        # Nothing to save until a login or a restored session has completed
+        if self.session is None or self.logged_in_at is None or self.request_token is None:
+            return
+        data = {
+            "cookies": [
+                {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path}
+                for c in self.session.cookies
+            ],
+            "request_token": self.request_token,
+            "datetime": self.logged_in_at.isoformat(),
+        }
+        save_json(self.path, data, indent=2)
+        print(f"Session saved to {self.path}")
+
+    def _login(self):
+        self.session.cookies.clear()
+        self.logged_in_at = self.request_token = None
+        self._authenticate(self.session)
+        self.logged_in_at = datetime.now(timezone.utc)
+        self.request_token = self._fetch_token(self.session)
+        self.save()
+
+    def get(self):
+        """The shared ``(session, request_token)``, logging in only if nothing is saved."""
+        with self._lock:
+            if self.session is not None:
+                return self.session, self.request_token
+            self.session = self._create_session()
+            saved = self._load()
+            if saved is None:
+                self._login()
+                return self.session, self.request_token
+
+            for c in saved["cookies"]:
+                self.session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+            self.logged_in_at = saved["logged_in_at"]
+            self.request_token = saved.get("request_token")
+            age_hours = (datetime.now(timezone.utc) - self.logged_in_at).total_seconds() / 3600
+            print(f"Reusing saved session ({age_hours:.1f} hours old).")
+            if self.request_token is None:
+                # Saved before request tokens were kept with the cookies
+                self.request_token = self._fetch_token(self.session)
+                self.save()
+            return self.session, self.request_token
+
+    def reauthenticate(self, stale_token):
+        """Log in again after ``stale_token`` was rejected. Returns the new ``(session, request_token)``.
+
+        If another thread already logged in again since ``stale_token`` was
+        handed out, its login is reused.
+        """
+        with self._lock:
+            if self.request_token == stale_token:
+                print("Saved session was rejected, logging in again.")
+                self._login()
+            return self.session, self.request_token
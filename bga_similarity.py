@@ -0,0 +1,142 @@
+"""Tag-similarity neighbours over the game catalogue.
+
+Each game gets a sparse feature vector: its tags weighted by inverse
+document frequency (so "Casual games" counts for less than "Trains"), a
+popularity band from ``log10(weight)``, and its duration bucket. Vectors
+are unit length, so a dot product is their cosine similarity.
+
+``NeighbourIndex.build`` computes every game's top-k most similar games
+once, with a NumPy matrix product if NumPy is installed and a sparse
+inverted-index pass otherwise, and the result is cached until the
+catalogue changes. Recommending is then a weighted sum over the seed
+games' neighbour lists.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from bga_catalogue import DURATION_BUCKETS, duration_bucket
+from bga_storage import load_binary, save_binary
+
+NEIGHBOUR_INDEX_VERSION = 1
+# Tag categories that say nothing about the game itself
+IGNORED_TAG_CATEGORIES = {"Admin"}
+WEIGHT_BAND_FEATURE = 0.5
+DURATION_FEATURE = 1.0
+SIM_DECIMALS = 9
+# Catalogue fields the vectors are built from
+FEATURE_FIELDS = ("tags", "weight", "average_duration")
+
+
+def game_vectors(catalogue):
+    """Unit-length ``{feature: value}`` vectors for every game in a ``CatalogueIndex``."""
+    data = catalogue.data
+    n_games = len(catalogue.game_ids)
+    df = defaultdict(int)
+    for tags in data["game_tags"]:
+        for t in tags:
+            df[t] += 1
+    idf = {t: math.log(n_games / count) for t, count in df.items()}
+    n_tags = len(catalogue.tags)
+    duration_features = {label: n_tags + 8 + i for i, (label, _) in enumerate(DURATION_BUCKETS)}
+
+    vectors = []
+    for pos in range(n_games):
+        vec = {t: idf[t] for t in data["game_tags"][pos] if catalogue.tags[t][1] not in IGNORED_TAG_CATEGORIES and idf[t] > 0}
+        band = min(7, int(math.log10((data["weights"][pos] or 0) + 1)))
+        vec[n_tags + band] = WEIGHT_BAND_FEATURE
+        bucket = duration_bucket(data["durations"][pos])
+        vec[duration_features[bucket] if bucket else n_tags + 8 + len(DURATION_BUCKETS)] = DURATION_FEATURE
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        vectors.append({f: v / norm for f, v in vec.items()})
+    return vectors
+
+
+def _top_k_numpy(vectors, k):
+    import numpy as np
+
+    n_features = 1 + max(f for vec in vectors for f in vec)
+    matrix = np.zeros((len(vectors), n_features))
+    for pos, vec in enumerate(vectors):
+        matrix[pos, list(vec)] = list(vec.values())
+    # Rounded so float noise cannot reorder ties differently from the sparse pass
+    sims = np.round(matrix @ matrix.T, SIM_DECIMALS)
+    np.fill_diagonal(sims, -1.0)
+    positions = np.broadcast_to(np.arange(len(vectors)), sims.shape)
+    order = np.lexsort((positions, -sims))[:, :k]
+    return [
+        [(int(other), float(sims[pos, other])) for other in order[pos] if sims[pos, other] > 0]
+        for pos in range(len(vectors))
+    ]
+
+
+def _top_k_sparse(vectors, k):
+    postings = defaultdict(list)
+    for pos, vec in enumerate(vectors):
+        for f, v in vec.items():
+            postings[f].append((pos, v))
+    neighbours = []
+    for pos, vec in enumerate(vectors):
+        scores = defaultdict(float)
+        for f, v in vec.items():
+            for other, w in postings[f]:
+                scores[other] += v * w
+        scores.pop(pos, None)
+        ranked = ((other, round(score, SIM_DECIMALS)) for other, score in scores.items())
+        neighbours.append(heapq.nsmallest(k, (x for x in ranked if x[1] > 0), key=lambda x: (-x[1], x[0])))
+    return neighbours
+
+
+class NeighbourIndex:
+    """Each game's ``k`` most similar games, by catalogue position."""
+
+    def __init__(self, data):
+        self.data = data
+        self.neighbours = data["neighbours"]
+
+    @classmethod
+    def build(cls, catalogue, k=20):
+        vectors = game_vectors(catalogue)
+        try:
+            neighbours = _top_k_numpy(vectors, k)
+        except ImportError:
+            neighbours = _top_k_sparse(vectors, k)
+        return cls({
+            "version": NEIGHBOUR_INDEX_VERSION,
+            "source": catalogue.data.get("source"),
+            "k": k,
+            "neighbours": [[[other, round(sim, 4)] for other, sim in row] for row in neighbours],
+        })
+
+    @classmethod
+    def load(cls, path, source=None, k=None):
+        """Load a saved index, or None if missing, outdated, built with another ``k`` or from another catalogue."""
+        data = load_binary(path)
+        if data is None:
+            return None
+        if data.get("version") != NEIGHBOUR_INDEX_VERSION or data.get("source") != source:
+            return None
+        if k is not None and data.get("k") != k:
+            return None
+        return cls(data)
+
+    def save(self, path):
+        save_binary(path, self.data)
+
+    def recommend(self, seeds, candidates, limit=5):
+        """Rank ``candidates`` (a set of positions) by similarity to ``seeds`` ({position: weight}).
+
+        Returns ``[(position, score, seed position that contributed most)]``, best first.
+        """
+        scores = defaultdict(float)
+        because = {}
+        for seed, weight in seeds.items():
+            for other, sim in self.neighbours[seed]:
+                if other not in candidates:
+                    continue
+                contribution = weight * sim
+                scores[other] += contribution
+                if contribution > because.get(other, (None, 0.0))[1]:
+                    because[other] = (seed, contribution)
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:limit]
+        return [(pos, score, because[pos][0]) for pos, score in ranked]
@@ -0,0 +1,149 @@
+"""Atomic file writes and the binary storage format.
+
+Every write goes to ``<path>.tmp`` and is renamed over ``path`` once it is
+complete, so a crash mid-write leaves the previous file intact.
+
+Binary files start with a fixed header (magic bytes, format version and a
+small JSON ``meta`` block) followed by a pickled payload. Pickle loads the
+nested dicts and lists of the catalogue and stats several times faster than
+JSON and keeps sets and tuples as they are. A file with another magic or
+version reads as missing, so callers rebuild or re-import it. These files
+are only ever written by this tool; never load one from elsewhere.
+
+``Document`` pairs a binary primary copy with an optional JSON export for
+humans (``bga_games.json``, ``bga_stats.json``). Readers use the binary
+copy, and an export that was edited or replaced by hand is imported back.
+"""
+import json
+import os
+import pickle
+import struct
+from contextlib import contextmanager
+
+MAGIC = b"BGASTORE"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct(">HI")  # format version, meta length
+
+
+def file_signature(path):
+    """``"size:mtime_ns"`` for ``path``, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """Open a temporary file for writing and rename it over ``path`` on success."""
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_json(path, data, indent=None):
+    with atomic_write(path) as f:
+        json.dump(data, f, indent=indent)
+
+
+def load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_binary(path, data, meta=None):
+    meta_bytes = json.dumps(meta or {}).encode("utf-8")
+    with atomic_write(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER.pack(FORMAT_VERSION, len(meta_bytes)))
+        f.write(meta_bytes)
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        return None
+    header = f.read(_HEADER.size)
+    if len(header) != _HEADER.size:
+        return None
+    version, meta_length = _HEADER.unpack(header)
+    if version != FORMAT_VERSION:
+        return None
+    return json.loads(f.read(meta_length))
+
+
+def read_meta(path):
+    """The ``meta`` block of a binary file, without loading its payload. None if missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            return _read_header(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def load_binary(path, default=None):
+    """The payload of a binary file, or ``default`` if it is missing, from another format version, or corrupt."""
+    try:
+        with open(path, "rb") as f:
+            if _read_header(f) is None:
+                return default
+            return pickle.load(f)
+    except FileNotFoundError:
+        return default
+    except (pickle.UnpicklingError, EOFError, ValueError, AttributeError) as e:
+        print(f"Could not load {path}: {e}")
+        return default
+
+
+class Document:
+    """A data file kept in the binary format, with an optional JSON export.
+
+    The binary copy at ``path`` is the one read. ``save`` writes the JSON
+    export first (when asked to) and records its signature in the binary
+    file's meta block. If the export later has a different signature, it
+    was changed outside this tool and ``load`` imports it.
+    """
+
+    def __init__(self, path, export_path, indent=None):
+        self.path = path
+        self.export_path = export_path
+        self.indent = indent
+
+    def _stale(self):
+        export_signature = file_signature(self.export_path)
+        if export_signature is None:
+            return False
+        meta = read_meta(self.path)
+        return meta is None or meta.get("export_signature") != export_signature
+
+    def load(self, default=None):
+        if self._stale():
+            data = load_json(self.export_path)
+            self.save(data, export=False)
+            return data
+        return load_binary(self.path, default)
+
+    def save(self, data, export=True):
+        if export:
+            save_json(self.export_path, data, indent=self.indent)
+        save_binary(self.path, data, meta={"export_signature": file_signature(self.export_path)})
+
+    def signature(self):
+        """Signature of the current binary copy, importing the export first if it changed."""
+        if self._stale():
+            self.load()
+        return file_signature(self.path)
+
+    def exists(self):
+        return os.path.exists(self.path) or os.path.exists(self.export_path)
@@ -0,0 +1,285 @@
+"""Pluggable transports for the BGA and Signal HTTP calls.
+
+Selected with ``BGA_TRANSPORT``:
+
+- ``live`` (default): talk to the real services.
+- ``record:<dir>``: talk to the real services and save every exchange as a
+  fixture under ``<dir>``.
+- ``replay:<dir>``: answer every request from the fixtures in ``<dir>``;
+  nothing leaves the machine.
+- ``server:<url>``: send every request to a local stand-in server started
+  with ``python bga_transport.py serve <dir>``, which answers from fixtures
+  over real HTTP.
+
+``BGA_LATENCY_MS`` (a number, or ``recorded`` to replay recorded timings),
+``BGA_JITTER_MS`` and ``BGA_ERROR_RATE`` add per-request delay, jitter and
+injected 503s/connection errors to any transport, so pagination, rate
+limiting and retries can be profiled without network access.
+
+Fixtures hold response cookies and pages exactly as served; keep them out
+of version control.
+"""
+import argparse
+import base64
+import hashlib
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Query parameters and form fields that change between otherwise identical requests
+VOLATILE_FIELDS = {"dojo.preventCache", "password", "request_token"}
+ORIGINAL_URL_HEADER = "X-BGA-Original-URL"
+# Headers that describe the wire encoding, not the stored (decoded) body
+HOP_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection"}
+
+
+def _normalise(pairs):
+    return urlencode(sorted((k, v) for k, v in pairs if k not in VOLATILE_FIELDS))
+
+
+def fixture_key(method, url, body=None):
+    parts = urlsplit(url)
+    url = urlunsplit((parts.scheme, parts.netloc, parts.path, _normalise(parse_qsl(parts.query)), ""))
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    if body and "=" in body and not body.lstrip().startswith(("{", "[")):
+        body = _normalise(parse_qsl(body))
+    return hashlib.sha1(f"{method.upper()} {url}\n{body or ''}".encode("utf-8")).hexdigest()[:20]
+
+
+class FixtureStore:
+    """Recorded exchanges on disk, one JSON file per request key.
+
+    A key can hold several responses (e.g. the same page fetched twice in a
+    run); replay serves them in order and then keeps repeating the last one.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._served = {}
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def record(self, method, url, body, resp, elapsed_ms):
+        key = fixture_key(method, url, body)
+        original = getattr(resp.raw, "_original_response", None)
+        exchange = {
+            "status": resp.status_code,
+            "reason": resp.reason,
+            "headers": {k: v for k, v in resp.headers.items() if k.lower() not in HOP_HEADERS and k.lower() != "set-cookie"},
+            "set_cookie": (original.msg.get_all("Set-Cookie") or []) if original is not None else [],
+            "body": base64.b64encode(resp.content).decode("ascii"),
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            fixture = {"method": method.upper(), "url": url, "responses": []}
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    fixture = json.load(f)
+            fixture["responses"].append(exchange)
+            with open(path, "w") as f:
+                json.dump(fixture, f, indent=2)
+
+    def lookup(self, method, url, body, advance=True):
+        key = fixture_key(method, url, body)
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            responses = json.load(f)["responses"]
+        with self._lock:
+            n = self._served.get(key, 0)
+            if advance:
+                self._served[key] = n + 1
+        return responses[min(n, len(responses) - 1)]
+
+
+def _build_response(request, exchange):
+    resp = requests.Response()
+    resp.status_code = exchange["status"]
+    resp.reason = exchange.get("reason")
+    resp.headers = CaseInsensitiveDict(exchange["headers"])
+    resp._content = base64.b64decode(exchange["body"])
+    resp.encoding = get_encoding_from_headers(resp.headers)
+    resp.url = request.url
+    resp.request = request
+    # Session.send reads cookies from raw._original_response.msg
+    msg = http.client.HTTPMessage()
+    for cookie in exchange.get("set_cookie", []):
+        msg["Set-Cookie"] = cookie
+    resp.raw = SimpleNamespace(_original_response=SimpleNamespace(msg=msg))
+    return resp
+
+
+class RecordingAdapter(HTTPAdapter):
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        resp = super().send(request, **kwargs)
+        self.store.record(request.method, request.url, request.body, resp, (time.perf_counter() - start) * 1000)
+        return resp
+
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def send(self, request, **kwargs):
+        exchange = self.store.lookup(request.method, request.url, request.body)
+        if exchange is None:
+            raise requests.ConnectionError(f"No recorded fixture for {request.method} {request.url}", request=request)
+        return _build_response(request, exchange)
+
+    def close(self):
+        pass
+
+
+class StandInAdapter(HTTPAdapter):
+    """Send every request to a local stand-in server, keeping the original URL in a header."""
+
+    def __init__(self, server_url, **kwargs):
+        super().__init__(**kwargs)
+        self.server_url = server_url.rstrip("/")
+
+    def send(self, request, **kwargs):
+        forwarded = request.copy()
+        parts = urlsplit(request.url)
+        forwarded.url = self.server_url + parts.path + (f"?{parts.query}" if parts.query else "")
+        forwarded.headers[ORIGINAL_URL_HEADER] = request.url
+        resp = super().send(forwarded, **kwargs)
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+
+class FaultInjectingAdapter(BaseAdapter):
+    """Wrap another adapter with latency, jitter and random failures."""
+
+    def __init__(self, inner, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, use_recorded=False, store=None):
+        super().__init__()
+        self.inner = inner
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.use_recorded = use_recorded
+        self.store = store
+
+    def send(self, request, **kwargs):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if self.use_recorded and self.store is not None:
+            exchange = self.store.lookup(request.method, request.url, request.body, advance=False)
+            if exchange:
+                delay += exchange.get("elapsed_ms", 0)
+        time.sleep(max(0.0, delay) / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            if random.random() < 0.5:
+                raise requests.ConnectionError("Injected connection error", request=request)
+            return _build_response(request, {"status": 503, "reason": "Injected", "headers": {}, "body": ""})
+        return self.inner.send(request, **kwargs)
+
+    def close(self):
+        self.inner.close()
+
+
+def configure_session(session, env=None):
+    """Mount the transport selected by ``BGA_TRANSPORT`` (and any fault injection) on ``session``."""
+    env = env if env is not None else os.environ
+    mode, _, target = env.get("BGA_TRANSPORT", "live").partition(":")
+    store = None
+    if mode == "live":
+        adapter = HTTPAdapter()
+    elif mode == "record":
+        store = FixtureStore(target)
+        adapter = RecordingAdapter(store)
+    elif mode == "replay":
+        store = FixtureStore(target)
+        adapter = ReplayAdapter(store)
+    elif mode == "server":
+        adapter = StandInAdapter(target)
+    else:
+        raise ValueError(f"Unknown BGA_TRANSPORT: {env['BGA_TRANSPORT']}")
+
+    latency = env.get("BGA_LATENCY_MS", "0")
+    use_recorded = latency == "recorded"
+    jitter = float(env.get("BGA_JITTER_MS", 0))
+    error_rate = float(env.get("BGA_ERROR_RATE", 0))
+    if use_recorded or float(latency) or jitter or error_rate:
+        adapter = FaultInjectingAdapter(
+            adapter,
+            latency_ms=0.0 if use_recorded else float(latency),
+            jitter_ms=jitter,
+            error_rate=error_rate,
+            use_recorded=use_recorded,
+            store=store if mode == "replay" else None,
+        )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def serve_fixtures(directory, host="127.0.0.1", port=8765):
+    """Run a local HTTP server that answers forwarded requests from recorded fixtures."""
+    store = FixtureStore(directory)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _handle(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else None
+            url = self.headers.get(ORIGINAL_URL_HEADER) or self.path
+            exchange = store.lookup(self.command, url, body)
+            if exchange is None:
+                self.send_error(404, f"No recorded fixture for {self.command} {url}")
+                return
+            content = base64.b64decode(exchange["body"])
+            self.send_response(exchange["status"], exchange.get("reason"))
+            for name, value in exchange["headers"].items():
+                self.send_header(name, value)
+            for cookie in exchange.get("set_cookie", []):
+                self.send_header("Set-Cookie", cookie)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving fixtures from {directory} on http://{host}:{port} (BGA_TRANSPORT=server:http://{host}:{port})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BGA transport tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Serve recorded fixtures from a local stand-in server")
+    serve.add_argument("directory")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    serve_fixtures(args.directory, args.host, args.port)
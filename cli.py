@@ -1,52 +1,109 @@
 import argparse
-import random
-from bga_functions import pull_game_list, pull_player_history, suggest_forgotten_games, suggest_new_games, send_signal_message
-
-SUGGEST_INTROS = [
-    "It's time for this week's games roundup!",
-    "Game night is calling — here's what's on the radar this week.",
-    "Your weekly game suggestions have arrived!",
-    "What should we play this week? Here are some ideas.",
-    "Fresh off the press: your weekly game recommendations!",
-    "Gather round — it's time to pick what we're playing this week.",
-    "It's that time again — let's figure out what we're playing!",
-    "Who needs Netflix? Here's what we should be playing this week.",
-    "Another week, another chance to find your next favourite game.",
-    "Here's what BGA has in store for us this week.",
-    "Meeples at the ready! Here are this week's suggestions.",
-]
-
-def suggest_games(awards_only=False):
-    parts = []
-    result = suggest_forgotten_games()
-    if result:
-        parts.append(result.strip())
-    result = suggest_new_games(awards_only)
-    if result:
-        parts.append(result.strip())
-    return random.choice(SUGGEST_INTROS) + "\n\n" + "\n\n".join(parts)
+import json
+import os
+from datetime import datetime
+
+import bga_profile
+from bga_data import STORAGE_DIR
+from bga_functions import DEFAULT_GROUP, pull_game_list, pull_player_history, export_history, generate_stats, stats_between, InvalidDate, check_stats_consistency, suggest_forgotten_games, suggest_new_games, suggest_added_games, search_games, show_rivals, recommend_games, suggest_games, send_signal_message, flush_signal_outbox
 
 COMMANDS = {
     "games": pull_game_list,
     "history": pull_player_history,
+    "stats": generate_stats,
+    "export": export_history,
     "new": suggest_new_games,
     "forgotten": suggest_forgotten_games,
-    "suggest": suggest_games
+    "recommend": recommend_games,
+    "added": suggest_added_games,
+    "search": search_games,
+    "rivals": show_rivals,
+    "suggest": suggest_games,
+    "serve": None,  # bga_daemon is imported only when serving, see run_command
 }
 
 parser = argparse.ArgumentParser(description="BGA data tools")
 parser.add_argument("command", choices=COMMANDS.keys(), help="Command to run")
+parser.add_argument("query", nargs="*", help="Game name to look up (search), or to narrow rivals to")
 parser.add_argument("--awards", action="store_true", help="Only suggest award-winning games")
 parser.add_argument("--signal", action="store_true", help="Send suggestions via Signal")
+parser.add_argument("--check", action="store_true", help="Check incremental stats against a full rebuild")
+parser.add_argument("--from", dest="date_from", help="Stats for games ending on or after this date (YYYY-MM-DD, or e.g. 90d for 90 days ago)")
+parser.add_argument("--to", dest="date_to", help="Stats for games ending on or before this date (YYYY-MM-DD, default today)")
+parser.add_argument("--group", help="Comma-separated group of players for forgotten, recommend and rivals (default thomaspr,alice2,kristiah; all tracked players for rivals)")
+parser.add_argument("--min-plays", type=int, default=2, help="Minimum plays for a forgotten game (default 2)")
+parser.add_argument("--older-than", type=int, default=365, help="Days since a forgotten game was last played (default 365)")
+parser.add_argument("--days", type=int, default=7, help="How far back added looks for games new on BGA (default 7)")
+parser.add_argument("--limit", type=int, default=10, help="Maximum search results (default 10)")
+parser.add_argument("--export", action="store_true", help="Export the history store to bga_history.json")
+parser.add_argument("--backfill", action="store_true", help="Import the full history in resumable, checkpointed pages")
+parser.add_argument("--players", help="Comma-separated player ids to sync (default: BGA_PLAYER_IDS, or BGA_PLAYER_ID)")
+parser.add_argument("--listen", help="Address for serve: host:port, or unix:/path/to.sock (default 127.0.0.1:8766)")
+parser.add_argument("--profile", action="store_true", help="Print phase timings and write a JSON trace to storage/profiles")
 args = parser.parse_args()
 
-if args.command in ("new", "suggest"):
-    result = COMMANDS[args.command](awards_only=args.awards)
-elif args.command == "forgotten":
-    result = COMMANDS[args.command]()
-else:
-    result = None
-    COMMANDS[args.command]()
 
-if args.signal and result:
-    send_signal_message(result)
+def _parse_group(args, default):
+    if not args.group:
+        return default
+    return [p.strip() for p in args.group.split(",") if p.strip()]
+
+
+def run_command(args):
+    if args.command in ("new", "suggest"):
+        result = COMMANDS[args.command](awards_only=args.awards)
+    elif args.command == "forgotten":
+        result = COMMANDS[args.command](_parse_group(args, DEFAULT_GROUP), min_plays=args.min_plays, older_than_days=args.older_than)
+    elif args.command == "recommend":
+        result = COMMANDS[args.command](_parse_group(args, DEFAULT_GROUP))
+    elif args.command == "added":
+        result = COMMANDS[args.command](days=args.days)
+    elif args.command == "search":
+        result = None
+        if not args.query:
+            parser.error("search needs a game name")
+        COMMANDS[args.command](" ".join(args.query), limit=args.limit)
+    elif args.command == "rivals":
+        result = None
+        COMMANDS[args.command](_parse_group(args, None), game=" ".join(args.query) or None)
+    elif args.command == "history":
+        result = None
+        COMMANDS[args.command](export=args.export, backfill=args.backfill, players=args.players)
+    elif args.command == "serve":
+        result = None
+        # The daemon pulls in http.server and socketserver, which no other command needs
+        from bga_daemon import DEFAULT_LISTEN, serve
+        serve(args.listen or DEFAULT_LISTEN, awards_only=args.awards, send_signal=args.signal)
+    elif args.command == "stats" and (args.date_from or args.date_to):
+        result = None
+        try:
+            print(json.dumps(stats_between(args.date_from, args.date_to), indent=2))
+        except InvalidDate as e:
+            parser.error(str(e))
+    elif args.command == "stats" and args.check:
+        result = None
+        if not check_stats_consistency():
+            raise SystemExit(1)
+    else:
+        result = None
+        COMMANDS[args.command]()
+
+    if args.signal and result:
+        send_signal_message(result)
+    elif (args.signal or args.command == "suggest") and args.command != "serve":
+        # Retry anything an earlier run could not deliver
+        flush_signal_outbox()
+
+
+if args.profile:
+    bga_profile.enable()
+with bga_profile.phase(f"command:{args.command}"):
+    run_command(args)
+
+if args.profile:
+    profile_dir = os.path.join(STORAGE_DIR, "profiles")
+    os.makedirs(profile_dir, exist_ok=True)
+    trace_file = os.path.join(profile_dir, f"profile-{args.command}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    bga_profile.write_trace(trace_file)
+    bga_profile.print_summary()
+    print(f"\nTrace written to {trace_file}")